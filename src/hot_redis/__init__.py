@@ -4,3 +4,8 @@ from .client import *
 from .redis_range import RedisRange
 from .fast_set import DelayButFastSet
 from .fast_dict import DelayButFastDict
+from .async_fast_set import AsyncDelayButFastSet
+from .async_fast_dict import AsyncDelayButFastDict
+from .fast_cache_registry import FastCacheRegistry
+from .bucketed_fast_dict import BucketedDelayButFastDict
+from .lru_fast_dict import LRUDelayButFastDict
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import asyncio
+import logging
+import time
+
+from typing import Any, List, Optional
+
+from redis.asyncio import Redis
+
+from hot_redis.changelog import AsyncChangelog
+from hot_redis.fast_cache import queue_ops
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AsyncFastCache:
+    """
+    FastCache for asyncio, built on a `redis.asyncio` client.
+
+    Reads stay synchronous and only look at the in-memory snapshot. When the
+    snapshot expired, a read schedules `check_version()` as a task on the
+    running loop and returns the current snapshot, so the loop never waits
+    for redis. Writes are coroutines.
+    """
+
+    def __init__(self, redis_client, value_key: str, version_key: str, timeout,
+                 startup_init: bool = False,
+                 changelog_key: str = "", changelog_size: int = 0):
+        """
+        params:
+            startup_init: start loading the data as soon as the instance is created,
+                this needs a running event loop. Use `await cache.refresh()` to wait
+                for the data instead
+            changelog_key, changelog_size: see hot_redis.changelog.Changelog
+        """
+        if redis_client is None:
+            redis_client = Redis(decode_responses=True)
+        assert redis_client.get_encoder().decode_responses is True
+
+        self.redis_client = redis_client
+        self.value_key = value_key
+        self.version_key = version_key
+        self.changelog: Optional[AsyncChangelog] = None
+        if changelog_size:
+            self.changelog = AsyncChangelog(
+                redis_client, value_key, version_key, changelog_key, changelog_size,
+            )
+
+        self.timeout = timeout
+        self._value: Any = self._empty()
+        self.expire_at = time.perf_counter()
+        self.version = -1
+        self._task: Optional[asyncio.Task] = None
+        if startup_init:
+            self.refresh_in_need()
+
+    def _empty(self) -> Any:
+        raise NotImplementedError
+
+    def _copy(self, value: Any) -> Any:
+        raise NotImplementedError
+
+    def _apply_op(self, value: Any, op: list) -> None:
+        raise NotImplementedError
+
+    async def refresh(self) -> None:
+        raise NotImplementedError
+
+    def refresh_in_need(self) -> None:
+        if time.perf_counter() < self.expire_at:
+            return
+        self.expire_at = time.perf_counter() + self.timeout
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.check_version())
+            self._task.add_done_callback(self._log_failure)
+
+    def _log_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            LOGGER.error("refresh of %s failed", self.value_key, exc_info=task.exception())
+
+    async def check_version(self) -> None:
+        """
+        compare the local version with redis and refresh the snapshot if it moved
+        """
+        version = int(await self.redis_client.get(self.version_key) or 0)
+        if version == self.version:
+            return
+        if self.changelog:
+            changes = await self.changelog.read(self.version, version)
+            if changes is not None:
+                self.apply_changes(version, changes)
+                return
+        await self.refresh()
+
+    def apply_changes(self, version: int, changes: List[List[list]]) -> None:
+        """
+        replay the operations read from the changelog on a copy of the
+        local value, so readers never see a half applied snapshot
+        """
+        value = self._copy(self._value)
+        for ops in changes:
+            for op in ops:
+                self._apply_op(value, op)
+        self.version = version
+        self._value = value
+
+    async def submit(self, ops: List[list]) -> None:
+        """
+        write the ops to redis, then apply them to the local snapshot
+        and follow the version if the write was the only one since
+        the snapshot, see FastCache._follow_own_write
+        """
+        # Execute Redis operations first
+        version = await self.write(ops)
+        # a snapshot of `version` or later, loaded while we waited, already holds the write
+        if version <= self.version:
+            return
+        # Update local value only after Redis operation succeeds
+        for op in ops:
+            self._apply_op(self._value, op)
+        if version == self.version + 1:
+            self.version = version
+
+    async def write(self, ops: List[list]) -> int:
+        """
+        execute the write operations and increase the version in one
+        round trip, return the new version
+        """
+        if self.changelog:
+            return await self.changelog.record(ops)
+        pipeline = self.redis_client.pipeline()
+        queue_ops(pipeline, self.value_key, ops)
+        return (await pipeline.incr(self.version_key).execute())[-1]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+from typing import Any, Dict, Generic, Iterable, Mapping, Optional, Union
+
+from hot_redis.async_fast_cache import AsyncFastCache
+from hot_redis.codecs import Codec, get_codec
+from hot_redis.fast_cache import bulk_ops
+from hot_redis.fast_dict import DelayButFastDict, K, V
+
+
+class AsyncDelayButFastDict(AsyncFastCache, Generic[K, V]):
+    """
+    asyncio version of DelayButFastDict, it shares the keys with DelayButFastDict
+    usage:
+
+        USER_CACHE = AsyncDelayButFastDict(redis.asyncio.Redis(decode_responses=True), key="USER_CACHE", timeout=5)
+        await USER_CACHE.refresh()
+        USER_CACHE["123"]  # KeyError if not exists
+        await USER_CACHE.set("123", "user_data")
+        USER_CACHE["123"]  # "user_data"
+    """
+
+    def __init__(self, redis_client=None, key="", timeout=10, startup_init: bool = False,
+                 changelog_size: int = 0, codec: Union[str, Codec] = "str"):
+        """
+        params:
+            startup_init: start loading data from redis on instance initialized
+            changelog_size, codec: same as DelayButFastDict
+        """
+        if not key:
+            raise ValueError("key cannot be empty")
+        self.codec = get_codec(codec)
+        self._value: Dict[str, Any]
+        # Use hash tags to ensure all keys are in the same Redis Cluster slot
+        super().__init__(
+            redis_client,
+            value_key=f"{{{key}}}:value",
+            version_key=f"{{{key}}}:version",
+            timeout=timeout,
+            startup_init=startup_init,
+            changelog_key=f"{{{key}}}:changelog",
+            changelog_size=changelog_size,
+        )
+
+    _empty = DelayButFastDict._empty
+    _copy = DelayButFastDict._copy
+    _build = DelayButFastDict._build
+    _apply_op = DelayButFastDict._apply_op
+
+    async def refresh(self) -> None:
+        version, value = await self.redis_client.pipeline()\
+                .get(self.version_key)\
+                .hgetall(self.value_key)\
+                .execute()
+        self.version = int(version or 0)
+        self._value = self._build(value)
+
+    def __contains__(self, key: K) -> bool:
+        self.refresh_in_need()
+        return str(key) in self._value
+
+    def __getitem__(self, key: K) -> V:
+        self.refresh_in_need()
+        str_key = str(key)
+        if str_key not in self._value:
+            raise KeyError(key)
+        return self._value[str_key]  # type: ignore
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        self.refresh_in_need()
+        return self._value.get(str(key), default)  # type: ignore
+
+    def keys(self):
+        self.refresh_in_need()
+        return self._value.keys()
+
+    def values(self):
+        self.refresh_in_need()
+        return self._value.values()
+
+    def items(self):
+        self.refresh_in_need()
+        return self._value.items()
+
+    def __iter__(self):
+        self.refresh_in_need()
+        return iter(self._value)
+
+    def __len__(self):
+        self.refresh_in_need()
+        return len(self._value)
+
+    async def set(self, key: K, value: V) -> None:
+        await self.submit([["hset", str(key), self.codec.encode(value)]])
+
+    async def delete(self, key: K) -> None:
+        await self.submit([["hdel", str(key)]])
+
+    async def update(self, *args, **kwargs) -> None:
+        if len(args) > 1:
+            raise TypeError(f"update expected at most 1 argument, got {len(args)}")
+        await self.set_many(dict(*args, **kwargs))
+
+    async def set_many(self, mapping: Mapping[K, V]) -> None:
+        ops = bulk_ops("hset", [
+            field
+            for key, value in mapping.items()
+            for field in (str(key), self.codec.encode(value))
+        ], 2)
+        if ops:
+            await self.submit(ops)
+
+    async def delete_many(self, keys: Iterable[K]) -> None:
+        ops = bulk_ops("hdel", [str(key) for key in keys])
+        if ops:
+            await self.submit(ops)
+
+    async def clear(self) -> None:
+        await self.submit([["del"]])
+
+    def __str__(self):
+        if len(self._value) <= 100:
+            return f"AsyncDelayButFastDict:{self.value_key}:{self.version_key}: {self._value}"
+        return f"AsyncDelayButFastDict:{self.value_key}:{self.version_key}: too many values..."
+
+    __repr__ = __str__
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+from typing import Generic, Set
+
+from hot_redis.async_fast_cache import AsyncFastCache
+from hot_redis.fast_cache import bulk_ops
+from hot_redis.fast_set import DelayButFastSet, T
+
+
+class AsyncDelayButFastSet(AsyncFastCache, Generic[T]):
+    """
+    asyncio version of DelayButFastSet, it shares the keys with the v2/v3 DelayButFastSet
+    usage:
+
+        WATCHING_USERS = AsyncDelayButFastSet(redis.asyncio.Redis(decode_responses=True), key="WATCHING_USERS", timeout=5)
+        await WATCHING_USERS.refresh()
+        "123" in WATCHING_USERS  # False
+        await WATCHING_USERS.add("123")
+        "123" in WATCHING_USERS  # True
+    """
+
+    def __init__(self, redis_client=None, key="", timeout=10, startup_init: bool = False,
+                 changelog_size: int = 0):
+        """
+        params:
+            startup_init: start loading data from redis on instance initialized
+            changelog_size: keep a v3 changelog of this size, 0 behaves like v2
+        """
+        if not key:
+            raise ValueError
+        self._value: Set[str]
+        # Use hash tags to ensure all keys are in the same Redis Cluster slot
+        super().__init__(
+            redis_client,
+            value_key=f"{{{key}}}:value",
+            version_key=f"{{{key}}}:version",
+            timeout=timeout,
+            startup_init=startup_init,
+            changelog_key=f"{{{key}}}:changelog",
+            changelog_size=changelog_size,
+        )
+
+    def _empty(self) -> Set[str]:
+        return set()
+
+    def _copy(self, value: Set[str]) -> Set[str]:
+        return set(value)
+
+    _apply_op = DelayButFastSet._apply_op
+
+    async def refresh(self) -> None:
+        version, value = await self.redis_client.pipeline()\
+                .get(self.version_key)\
+                .smembers(self.value_key)\
+                .execute()
+        self.version = int(version or 0)
+        self._value = value or set()
+
+    def __contains__(self, value: T) -> bool:
+        self.refresh_in_need()
+        return str(value) in self._value
+
+    def __iter__(self):
+        self.refresh_in_need()
+        return iter(self._value)
+
+    def __len__(self):
+        self.refresh_in_need()
+        return len(self._value)
+
+    async def add(self, value: T) -> None:
+        await self.submit([["sadd", str(value)]])
+
+    async def discard(self, value: T) -> None:
+        await self.submit([["srem", str(value)]])
+
+    remove = discard
+
+    async def update(self, *values: T) -> None:
+        ops = bulk_ops("sadd", [str(value) for value in values])
+        if ops:
+            await self.submit(ops)
+
+    def __str__(self):
+        if len(self._value) <= 100:
+            return f"AsyncDelayButFastSet:{self.value_key}:{self.version_key}: {self._value}"
+        return f"AsyncDelayButFastSet:{self.value_key}:{self.version_key}: too many values..."
+
+    __repr__ = __str__
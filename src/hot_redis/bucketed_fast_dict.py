@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import itertools
+import zlib
+
+from typing import Any, Callable, Dict, FrozenSet, Generic, Iterable, Iterator, List, Mapping, Optional
+
+from hot_redis.fast_cache import CacheChange
+from hot_redis.fast_cache_registry import FastCacheRegistry
+from hot_redis.fast_dict import DelayButFastDict, K, V
+
+
+class BucketedDelayButFastDict(Generic[K, V]):
+    """
+    DelayButFastDict split into `buckets` hashes, each with its own version.
+    A write only moves the version of its bucket, so the readers download
+    about 1/buckets of the data again instead of all of it.
+    usage:
+
+        CONFIG = BucketedDelayButFastDict(Redis(decode_responses=True), key="CONFIG", buckets=64, timeout=5)
+        CONFIG["feature"] = "on"
+        CONFIG["feature"]  # "on"
+
+    A field lives in bucket `crc32(field) % buckets`, stored like a DelayButFastDict
+    with key `{key}:{bucket}`, so every bucket has its own hash tag and the buckets
+    spread over the nodes of a cluster. The number of buckets can't change without
+    rewriting the data.
+    """
+
+    def __init__(self, redis_client=None, key="", buckets: int = 16, timeout=10,
+                 registry: Optional[FastCacheRegistry] = None, **kwargs):
+        """
+        params:
+            buckets: how many hashes the fields are split into
+            registry: the versions of every bucket are checked together in one
+                pipeline, by default with a registry of its own using `timeout`
+            other params are passed to every DelayButFastDict bucket,
+                except shared_path which is not supported
+        """
+        if not key:
+            raise ValueError("key cannot be empty")
+        if buckets <= 0:
+            raise ValueError("buckets must be positive")
+        if kwargs.get("shared_path"):
+            raise ValueError("shared_path can't be used with BucketedDelayButFastDict")
+        self.key = key
+        self.registry = registry or FastCacheRegistry(timeout=timeout)
+        self.buckets: List[DelayButFastDict[K, V]] = [
+            DelayButFastDict(
+                redis_client, key=f"{key}:{index}", timeout=timeout, registry=self.registry, **kwargs,
+            )
+            for index in range(buckets)
+        ]
+
+    def bucket(self, key: K) -> DelayButFastDict[K, V]:
+        """
+        the bucket holding `key`
+        """
+        return self.buckets[zlib.crc32(str(key).encode()) % len(self.buckets)]
+
+    def _group(self, keys: Iterable[K]) -> Dict[int, List[K]]:
+        groups: Dict[int, List[K]] = {}
+        for key in keys:
+            groups.setdefault(zlib.crc32(str(key).encode()) % len(self.buckets), []).append(key)
+        return groups
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.bucket(key)
+
+    def __getitem__(self, key: K) -> V:
+        return self.bucket(key)[key]
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self.bucket(key)[key] = value
+
+    def __delitem__(self, key: K) -> None:
+        del self.bucket(key)[key]
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        return self.bucket(key).get(key, default)
+
+    def setdefault(self, key: K, default: V) -> V:
+        return self.bucket(key).setdefault(key, default)
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        return self.bucket(key).pop(key, default)
+
+    def update(self, *args, **kwargs) -> None:
+        if len(args) > 1:
+            raise TypeError(f"update expected at most 1 argument, got {len(args)}")
+        self.set_many(dict(*args, **kwargs))
+
+    def set_many(self, mapping: Mapping[K, V]) -> None:
+        """
+        one write and one version increase per touched bucket
+        """
+        for index, keys in self._group(mapping).items():
+            self.buckets[index].set_many({key: mapping[key] for key in keys})
+
+    def delete_many(self, keys: Iterable[K]) -> None:
+        for index, bucket_keys in self._group(keys).items():
+            self.buckets[index].delete_many(bucket_keys)
+
+    def clear(self) -> None:
+        for bucket in self.buckets:
+            bucket.clear()
+
+    def keys(self) -> Iterator[str]:
+        return itertools.chain.from_iterable(bucket.keys() for bucket in self.buckets)
+
+    def values(self) -> Iterator[V]:
+        return itertools.chain.from_iterable(bucket.values() for bucket in self.buckets)
+
+    def items(self) -> Iterator:
+        return itertools.chain.from_iterable(bucket.items() for bucket in self.buckets)
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets)
+
+    def on_change(self, callback: Callable[[CacheChange], None]) -> Callable[[CacheChange], None]:
+        """
+        see FastCache.on_change, called once per changed bucket
+        """
+        for bucket in self.buckets:
+            bucket.on_change(callback)
+        return callback
+
+    def remove_on_change(self, callback: Callable[[CacheChange], None]) -> None:
+        for bucket in self.buckets:
+            bucket.remove_on_change(callback)
+
+    def add_index(self, name: str, key: Optional[Callable[[V], Any]] = None) -> None:
+        """
+        see DelayButFastDict.add_index, every bucket indexes its own fields
+        """
+        for bucket in self.buckets:
+            bucket.add_index(name, key)
+
+    def lookup(self, name: str, value: Any) -> FrozenSet[str]:
+        return frozenset().union(*(bucket.lookup(name, value) for bucket in self.buckets))
+
+    def invalidate(self) -> None:
+        for bucket in self.buckets:
+            bucket.invalidate()
+
+    def close(self) -> None:
+        for bucket in self.buckets:
+            bucket.close()
+
+    def __str__(self):
+        return f"BucketedDelayButFastDict:{self.key}: {len(self.buckets)} buckets"
+
+    __repr__ = __str__
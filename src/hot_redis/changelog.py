@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import json
+
+from typing import List, Optional
+
+
+# Applies a batch of write operations to KEYS[1], bumps the version counter
+# KEYS[2] once and appends `[version, ops]` to the bounded list KEYS[3].
+# Arguments are sent in chunks so huge batches stay below Lua's stack limit.
+RECORD_SCRIPT = """
+local ops = cjson.decode(ARGV[2])
+for _, op in ipairs(ops) do
+    local command = op[1]
+    if command == 'del' then
+        redis.call('DEL', KEYS[1])
+    else
+        for i = 2, #op, 1000 do
+            redis.call(command, KEYS[1], unpack(op, i, math.min(i + 999, #op)))
+        end
+    end
+end
+local version = redis.call('INCR', KEYS[2])
+redis.call('RPUSH', KEYS[3], '[' .. version .. ',' .. ARGV[2] .. ']')
+redis.call('LTRIM', KEYS[3], -tonumber(ARGV[1]), -1)
+return version
+"""
+
+
+class Changelog:
+    """
+    A bounded, version ordered log of the writes made to a fast cache.
+
+    Every write is a list of operations like `["hset", field, value, ...]`,
+    `["hdel", field, ...]`, `["sadd", member, ...]`, `["srem", member, ...]`
+    or `["del"]`. The operations are executed, the version is increased and
+    the log entry is appended atomically, so a reader at version `n` can
+    replay the entries `n+1 ... m` instead of downloading the whole key.
+    """
+
+    def __init__(self, redis_client, value_key: str, version_key: str, key: str, size: int):
+        if size <= 0:
+            raise ValueError("changelog size must be positive")
+        self.redis_client = redis_client
+        self.value_key = value_key
+        self.version_key = version_key
+        self.key = key
+        self.size = size
+        self._record = redis_client.register_script(RECORD_SCRIPT)
+
+    def record(self, ops: List[list]) -> int:
+        """
+        execute the operations and return the new version
+        """
+        return int(self._record(
+            keys=[self.value_key, self.version_key, self.key],
+            args=[self.size, json.dumps(ops)],
+        ))
+
+    def read(self, since: int, until: int) -> Optional[List[List[list]]]:
+        """
+        return the operations of every version in (since, until],
+        or None if the log does not cover all of them
+        """
+        if not self.covers(since, until):
+            return None
+        return self.parse(since, until, self.redis_client.lrange(self.key, since - until, -1))
+
+    def covers(self, since: int, until: int) -> bool:
+        """
+        whether the log can be long enough to hold every version in (since, until]
+        """
+        return 0 <= since < until <= since + self.size
+
+    def parse(self, since: int, until: int, raw_entries: List[str]) -> Optional[List[List[list]]]:
+        entries = [json.loads(entry) for entry in raw_entries]
+        if [entry[0] for entry in entries] != list(range(since + 1, until + 1)):
+            return None
+        return [entry[1] for entry in entries]
+
+
+class AsyncChangelog(Changelog):
+    """
+    Changelog for a `redis.asyncio` client
+    """
+
+    async def record(self, ops: List[list]) -> int:  # type: ignore[override]
+        return int(await self._record(
+            keys=[self.value_key, self.version_key, self.key],
+            args=[self.size, json.dumps(ops)],
+        ))
+
+    async def read(self, since: int, until: int) -> Optional[List[List[list]]]:  # type: ignore[override]
+        if not self.covers(since, until):
+            return None
+        return self.parse(since, until, await self.redis_client.lrange(self.key, since - until, -1))
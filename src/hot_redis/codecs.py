@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import json
+
+from typing import Any, Dict, Union
+
+
+class Codec:
+    """
+    convert the values of a DelayButFastDict between python objects and the
+    str stored in redis. Values are decoded once when the snapshot is loaded,
+    so reads return ready to use objects
+    """
+
+    # decode() returns its argument, the snapshot can skip decoding
+    passthrough = False
+
+    def encode(self, value: Any) -> str:
+        raise NotImplementedError
+
+    def decode(self, value: str) -> Any:
+        raise NotImplementedError
+
+
+class StrCodec(Codec):
+    passthrough = True
+
+    def encode(self, value: Any) -> str:
+        return str(value)
+
+    def decode(self, value: str) -> str:
+        return value
+
+
+class IntCodec(Codec):
+
+    def encode(self, value: Any) -> str:
+        return str(int(value))
+
+    def decode(self, value: str) -> int:
+        return int(value)
+
+
+class FloatCodec(Codec):
+
+    def encode(self, value: Any) -> str:
+        return repr(float(value))
+
+    def decode(self, value: str) -> float:
+        return float(value)
+
+
+class JsonCodec(Codec):
+
+    def encode(self, value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+    def decode(self, value: str) -> Any:
+        return json.loads(value)
+
+
+class OrjsonCodec(Codec):
+
+    def __init__(self):
+        import orjson  # optional dependency
+        self._orjson = orjson
+
+    def encode(self, value: Any) -> str:
+        return self._orjson.dumps(value).decode()
+
+    def decode(self, value: str) -> Any:
+        return self._orjson.loads(value)
+
+
+CODECS: Dict[str, type] = {
+    "str": StrCodec,
+    "int": IntCodec,
+    "float": FloatCodec,
+    "json": JsonCodec,
+    "orjson": OrjsonCodec,
+}
+
+
+def get_codec(codec: Union[str, Codec]) -> Codec:
+    """
+    params:
+        codec: a Codec instance or one of the names in CODECS
+    """
+    if isinstance(codec, Codec):
+        return codec
+    if codec not in CODECS:
+        raise ValueError(f"unknown codec {codec!r}, expected one of {sorted(CODECS)} or a Codec")
+    return CODECS[codec]()
@@ -0,0 +1,916 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import atexit
+import base64
+import json
+import logging
+import random
+import struct
+import sys
+import threading
+import time
+import weakref
+import zlib
+
+from collections import deque
+
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from redis import Redis
+
+from hot_redis.changelog import Changelog
+from hot_redis.invalidation import VersionWatcher
+from hot_redis.metrics import CacheMetrics
+from hot_redis.shared_snapshot import SharedSnapshot, write_snapshot
+
+if TYPE_CHECKING:
+    from hot_redis.fast_cache_registry import FastCacheRegistry
+
+
+LOGGER = logging.getLogger(__name__)
+
+# fields per HSET/HDEL/SADD/SREM of a bulk write, keeps every command reasonably small
+BULK_CHUNK = 1000
+
+# Returns `[version]` when KEYS[1] still equals ARGV[1], otherwise
+# `[version, "changes", entries]` when the changelog KEYS[3] covers the gap
+# or `[version, "value", reply of the ARGV[2] command on KEYS[2]]`.
+FETCH_SCRIPT = """
+local version = tonumber(redis.call('GET', KEYS[1]) or '0')
+local since = tonumber(ARGV[1])
+if version == since then
+    return {version}
+end
+if KEYS[3] and since >= 0 and since < version and version <= since + tonumber(ARGV[3]) then
+    return {version, 'changes', redis.call('LRANGE', KEYS[3], since - version, -1)}
+end
+return {version, 'value', redis.call(ARGV[2], KEYS[2])}
+"""
+
+# Stores ARGV[2] into KEYS[2] only if the version KEYS[1] still equals ARGV[1],
+# so a slow publisher never replaces the blob of a newer version.
+PUBLISH_BLOB_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+def bulk_ops(command: str, args: List[str], step: int = 1) -> List[list]:
+    """
+    split the arguments of one bulk command into ops of BULK_CHUNK fields
+    """
+    size = BULK_CHUNK * step
+    return [[command, *args[start:start + size]] for start in range(0, len(args), size)]
+
+
+def queue_ops(pipeline, key: str, ops: List[list]) -> None:
+    """
+    queue the commands executing the write operations on `key`
+    into a sync or async pipeline
+    """
+    for op in ops:
+        if op[0] == "del":
+            pipeline.delete(key)
+        elif op[0] == "hset":
+            pipeline.hset(key, mapping=dict(zip(op[1::2], op[2::2])))
+        else:
+            getattr(pipeline, op[0])(key, *op[1:])
+
+
+def _refresh_in_background(ref: "weakref.ref[FastCache]", wakeup: threading.Event, stopped: threading.Event) -> None:
+    """
+    keep the snapshot of a background refreshed cache up to date,
+    only holds the cache weakly so it can still be collected
+    """
+    while not stopped.is_set():
+        cache = ref()
+        if cache is None:
+            return
+        delay = cache.expire_at - time.perf_counter()
+        if delay <= 0:
+            try:
+                cache.check_version()
+            except Exception:  # keep serving the previous snapshot
+                LOGGER.exception("background refresh of %s failed", cache.value_key)
+            continue
+        del cache
+        wakeup.wait(delay)
+        wakeup.clear()
+
+
+def _flush_in_background(ref: "weakref.ref[FastCache]", interval: float, stopped: threading.Event) -> None:
+    """
+    send the buffered writes of a write-behind cache every `interval` seconds
+    """
+    while not stopped.wait(interval):
+        cache = ref()
+        if cache is None:
+            return
+        try:
+            cache.flush()
+        except Exception:  # the ops stay buffered for the next try
+            LOGGER.exception("flushing the writes of %s failed", cache.value_key)
+        del cache
+
+
+def _check_after_warm_start(cache: "FastCache") -> None:
+    """
+    bring a cache started from its snapshot file up to date
+    """
+    try:
+        with cache._refresh_lock:
+            cache.check_version()
+    except Exception:  # keep serving the snapshot of the file until the next check
+        LOGGER.exception("checking the version of %s after the warm start failed", cache.value_key)
+
+
+# the write-behind caches alive, flushed once more when the interpreter exits
+_WRITE_BEHIND_CACHES: "weakref.WeakSet[FastCache]" = weakref.WeakSet()
+# the caches with a snapshot file, saved once more when the interpreter exits
+_SNAPSHOT_CACHES: "weakref.WeakSet[FastCache]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    for cache in list(_WRITE_BEHIND_CACHES):
+        try:
+            cache.flush()
+        except Exception:
+            LOGGER.exception("flushing the writes of %s failed", cache.value_key)
+    for cache in list(_SNAPSHOT_CACHES):
+        cache.save_snapshot()
+
+
+def merge_ops(ops: List[list]) -> List[list]:
+    """
+    join the consecutive ops of the same command, keeping their order
+    """
+    merged: List[list] = []
+    for op in ops:
+        last = merged[-1] if merged else None
+        if last and last[0] == op[0] != "del" and len(last) < BULK_CHUNK * 2:
+            last.extend(op[1:])
+        else:
+            merged.append(list(op))
+    return merged
+
+
+class CacheChange(NamedTuple):
+    """
+    what one refresh or local write changed, passed to the on_change callbacks.
+    For a dict: {field: value} of the added and removed fields and {field: (old, new)}
+    of the changed ones. For a set: the added and removed members, changed is empty
+    """
+    added: Any
+    removed: Any
+    changed: Any
+
+
+class FastCache:
+    """
+    Shared version polling of DelayButFastDict and DelayButFastSet.
+
+    The data lives in `value_key` and every write increases `version_key`.
+    Each instance keeps a snapshot in `self._value` and checks the version
+    at most once every `timeout` seconds; the snapshot is reloaded, or
+    patched from the changelog, only when the version moved.
+    """
+
+    SCAN_RETRIES = 3
+    # seconds between two saves of the snapshot file
+    SNAPSHOT_INTERVAL = 60
+    # the command reading the whole value inside FETCH_SCRIPT
+    FETCH_COMMAND = ""
+
+    def __init__(self, redis_client, value_key: str, version_key: str, timeout,
+                 startup_init: bool = False,
+                 changelog_key: str = "", changelog_size: int = 0,
+                 invalidation: Optional[str] = None,
+                 background_refresh: bool = False,
+                 scan_count: int = 0,
+                 registry: Optional["FastCacheRegistry"] = None,
+                 write_behind: float = 0,
+                 write_behind_size: int = 1000,
+                 conditional_fetch: bool = False,
+                 snapshot_path: str = "",
+                 snapshot_key: str = "",
+                 snapshot_blob: bool = False,
+                 min_timeout: float = 0,
+                 max_timeout: float = 0):
+        """
+        params:
+            startup_init: load data from redis on instance initialized
+            changelog_key, changelog_size: see hot_redis.changelog.Changelog
+            invalidation: "tracking" or "keyspace", listen to the changes of the
+                version key (see hot_redis.invalidation.VersionWatcher) and only
+                check the version after it changed. `timeout` is then just a safety
+                net against lost messages and can be much longer
+            background_refresh: check the version and refresh on a daemon thread,
+                readers never wait for redis and always get the current snapshot,
+                except for the very first load of a lazy (startup_init=False) cache
+            scan_count: refresh with HSCAN/SSCAN in batches of this size instead of one
+                HGETALL/SMEMBERS, so redis is never blocked by one huge reply. The
+                version is checked again after the scan and the scan is retried if
+                it moved. 0 uses the single command
+            registry: check the version together with the other caches of the
+                registry, the timeout of the registry replaces `timeout`
+            write_behind: apply the writes to the local snapshot at once and send them
+                to redis every `write_behind` seconds, as one pipeline with a single
+                version increase. Buffered writes are lost if the process dies before
+                the flush; close() and interpreter exit flush them. 0 writes synchronously
+            write_behind_size: flush as soon as this many ops are buffered
+            conditional_fetch: check the version with FETCH_SCRIPT, which returns the
+                changes or the whole value only if the version moved: one round trip
+                per check and the value always matches the version. Can't be combined
+                with scan_count, the point of which is not reading everything at once
+            snapshot_path: save the snapshot and its version to this local file (see
+                hot_redis.shared_snapshot.write_snapshot) after a refresh, at most every
+                SNAPSHOT_INTERVAL seconds, and on close/exit. A new instance starts from
+                the file without waiting for redis and checks the version (replaying the
+                changelog if possible) on a background thread
+            snapshot_key, snapshot_blob: refresh by reading one compressed blob of the
+                whole value (`{version}:{base64 of zlib of json}`) from `snapshot_key`
+                instead of HGETALL/SMEMBERS. When the blob is missing or older than the
+                version, the reader loads the value as usual and publishes the blob for
+                the others, see publish_snapshot_blob. Can't be combined with scan_count
+                or conditional_fetch
+            min_timeout, max_timeout: adapt the interval of the version checks, starting
+                from `timeout`: it doubles up to `max_timeout` while the version stays the
+                same and falls back to `min_timeout` when it moves. A random factor of
+                0.8-1.2 per instance keeps a fleet of processes from checking in lockstep.
+                Ignored with a registry, which has its own timeout
+        """
+        if redis_client is None:
+            redis_client = Redis(decode_responses=True)
+        assert redis_client.get_encoder().decode_responses is True
+        if conditional_fetch and scan_count:
+            raise ValueError("conditional_fetch can't be used with scan_count")
+        if snapshot_blob and (scan_count or conditional_fetch):
+            raise ValueError("snapshot_blob can't be used with scan_count or conditional_fetch")
+        if bool(min_timeout) != bool(max_timeout) or min_timeout > max_timeout or min_timeout < 0:
+            raise ValueError("min_timeout and max_timeout must be set together, 0 < min_timeout <= max_timeout")
+
+        self.redis_client = redis_client
+        self.value_key = value_key
+        self.version_key = version_key
+        self.changelog: Optional[Changelog] = None
+        if changelog_size:
+            self.changelog = Changelog(
+                redis_client, value_key, version_key, changelog_key, changelog_size,
+            )
+
+        self._fetch = redis_client.register_script(FETCH_SCRIPT) if conditional_fetch else None
+        self.metrics = CacheMetrics()
+        self.snapshot_key = snapshot_key if snapshot_blob else ""
+        if snapshot_blob:
+            self._publish_blob = redis_client.register_script(PUBLISH_BLOB_SCRIPT)
+
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        if max_timeout:
+            timeout = min(max(timeout, min_timeout), max_timeout)
+        self._jitter = random.uniform(0.8, 1.2)
+        self.timeout = timeout
+        self.scan_count = scan_count
+        self.registry = registry
+        self.write_behind = write_behind
+        self.write_behind_size = write_behind_size
+        # ops applied locally but not written yet, and the ones being written
+        self._buffer: List[list] = []
+        self._flushing: List[list] = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # single flight: one thread checks the version, the others keep reading.
+        # Reentrant so a change callback can read or refresh the cache
+        self._refresh_lock = threading.RLock()
+        # guards the snapshot and its version: swaps, own writes and their follow
+        self._swap_lock = threading.RLock()
+        # how many snapshots were swapped in, see submit
+        self._swaps = 0
+        self._value: Any = self._empty()
+        self.snapshot_path = snapshot_path
+        self._saved_at = float("-inf")
+        # time.perf_counter() of the start of the last version check
+        self.checked_at = float("-inf")
+        self._callbacks: List[Callable[[CacheChange], None]] = []
+        # changes waiting for the callbacks, see _deliver
+        self._changes: Deque[CacheChange] = deque()
+        self._deliver_lock = threading.Lock()
+
+        warm = bool(snapshot_path) and self._load_snapshot()
+        if warm:
+            # readers don't wait for redis, the version is checked on a background thread
+            self.expire_at = time.perf_counter() + (0 if background_refresh else timeout)
+        elif startup_init:
+            self.expire_at = time.perf_counter() + random.random() * timeout
+            self.version = 0
+            self.checked_at = time.perf_counter()
+            self.refresh()
+        else:
+            self.expire_at = time.perf_counter()
+            self.version = -1
+
+        self.watcher: Optional[VersionWatcher] = None
+        if invalidation:
+            self.watcher = VersionWatcher(redis_client, version_key, self.invalidate, mode=invalidation)
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self.refresher: Optional[threading.Thread] = None
+        if background_refresh:
+            self.refresher = threading.Thread(
+                target=_refresh_in_background,
+                args=(weakref.ref(self), self._wakeup, self._stopped),
+                name=f"FastCache:{value_key}",
+                daemon=True,
+            )
+            self.refresher.start()
+
+        self.flusher: Optional[threading.Thread] = None
+        if write_behind:
+            self.flusher = threading.Thread(
+                target=_flush_in_background,
+                args=(weakref.ref(self), write_behind, self._stopped),
+                name=f"FastCache:{value_key}:flush",
+                daemon=True,
+            )
+            self.flusher.start()
+            _WRITE_BEHIND_CACHES.add(self)
+
+        if registry:
+            registry.register(self)
+
+        if snapshot_path:
+            _SNAPSHOT_CACHES.add(self)
+        if warm and not self.refresher:
+            threading.Thread(
+                target=_check_after_warm_start,
+                args=(self,),
+                name=f"FastCache:{value_key}:warm",
+                daemon=True,
+            ).start()
+
+    def _empty(self) -> Any:
+        raise NotImplementedError
+
+    def _copy(self, value: Any) -> Any:
+        raise NotImplementedError
+
+    def _apply_op(self, value: Any, op: list) -> None:
+        raise NotImplementedError
+
+    def _touched(self, ops: List[list]) -> Optional[Set]:
+        """
+        the keys the ops write, None if one of them deletes the whole value
+        """
+        raise NotImplementedError
+
+    def _pick(self, value: Any, keys: Set) -> Any:
+        """
+        the part of `value` holding `keys`, enough for _diff to compare them
+        """
+        raise NotImplementedError
+
+    def _diff(self, old: Any, new: Any, keys: Optional[Set] = None) -> CacheChange:
+        """
+        compare `keys`, or the whole values when None
+        """
+        raise NotImplementedError
+
+    def _build(self, value: Any) -> Any:
+        """
+        turn the value read from redis into a snapshot
+        """
+        return value or self._empty()
+
+    def _build_loaded(self, value: Any) -> Any:
+        """
+        `_build` the whole value read from redis and record its size
+        """
+        if value:
+            self.metrics.observe_payload(len(value), self._payload_size(value))
+        else:
+            self.metrics.observe_payload(0, 0)
+        return self._build(value)
+
+    def _payload_size(self, value: Any) -> int:
+        """
+        the length of the strings of a value read from redis
+        """
+        return sum(map(len, value))
+
+    def _memory(self, value: Any) -> int:
+        """
+        estimate the bytes used by the snapshot
+        """
+        return sys.getsizeof(value) + sum(map(sys.getsizeof, value))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        the metrics of this cache, see hot_redis.metrics.prometheus_text to export them.
+        entries and memory_bytes are computed on call, memory_bytes walks the snapshot
+        """
+        metrics = self.metrics
+        value = self._value
+        return {
+            "version": self.version,
+            "timeout": self.timeout,
+            "version_checks": metrics.version_checks,
+            "refreshes": metrics.refreshes,
+            "delta_refreshes": metrics.delta_refreshes,
+            "refresh_seconds": {
+                "sum": metrics.refresh_seconds,
+                "count": metrics.refreshes + metrics.delta_refreshes,
+                "buckets": list(metrics.refresh_buckets),
+            },
+            "payload_entries": metrics.payload_entries,
+            "payload_bytes": metrics.payload_bytes,
+            "entries": len(value),
+            "memory_bytes": self._memory(value),
+            "snapshot_age": None if metrics.swapped_at is None else time.monotonic() - metrics.swapped_at,
+        }
+
+    def _queue_load(self, pipeline) -> None:
+        """
+        queue the commands reading the version and the whole value
+        """
+        raise NotImplementedError
+
+    def _load(self) -> Tuple[Optional[str], Any]:
+        """
+        read the version and the whole value atomically
+        """
+        pipeline = self.redis_client.pipeline()
+        self._queue_load(pipeline)
+        version, value = pipeline.execute()
+        return version, self._build_loaded(value)
+
+    def _scan(self) -> Any:
+        """
+        read the whole value with SCAN like commands of `scan_count` size
+        """
+        raise NotImplementedError
+
+    def _dump(self, value: Any) -> Mapping[str, str]:
+        """
+        the content of the snapshot file for `value`
+        """
+        raise NotImplementedError
+
+    def _restore(self, snapshot: SharedSnapshot) -> Any:
+        """
+        turn the snapshot file back into a value
+        """
+        raise NotImplementedError
+
+    def _load_snapshot(self) -> bool:
+        try:
+            snapshot = SharedSnapshot(self.snapshot_path)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, struct.error):
+            LOGGER.warning("ignoring the unreadable snapshot %s of %s", self.snapshot_path, self.value_key)
+            return False
+        self._value = self._restore(snapshot)
+        self.version = snapshot.version
+        self._saved_at = time.perf_counter()
+        return True
+
+    def save_snapshot(self, version: Optional[int] = None, value: Any = None) -> None:
+        """
+        write the snapshot file now, by default with the current snapshot
+        """
+        if version is None:
+            version, value = self.version, self._value
+        if not self.snapshot_path or version == -1:
+            return
+        try:
+            write_snapshot(self.snapshot_path, version, self._dump(value))
+        except OSError:
+            LOGGER.exception("saving the snapshot of %s to %s failed", self.value_key, self.snapshot_path)
+            return
+        self._saved_at = time.perf_counter()
+
+    def _to_blob(self, value: Any) -> Any:
+        """
+        the json serializable form of a value read from redis
+        """
+        raise NotImplementedError
+
+    def _from_blob(self, value: Any) -> Any:
+        """
+        turn the json of `_to_blob` back into the value redis would return
+        """
+        raise NotImplementedError
+
+    def _load_blob(self) -> Tuple[Optional[str], Any]:
+        """
+        read the version and the snapshot blob, fall back to `_load` and
+        publish the blob when it does not match the version
+        """
+        version, blob = self.redis_client.pipeline()\
+                .get(self.version_key)\
+                .get(self.snapshot_key)\
+                .execute()
+        if blob:
+            blob_version, _, data = blob.partition(":")
+            if blob_version == (version or "0"):
+                value = json.loads(zlib.decompress(base64.b64decode(data)))
+                return version, self._build_loaded(self._from_blob(value))
+        pipeline = self.redis_client.pipeline()
+        self._queue_load(pipeline)
+        version, value = pipeline.execute()
+        self._store_blob(version or "0", value)
+        return version, self._build_loaded(value)
+
+    def _store_blob(self, version: str, value: Any) -> bool:
+        data = json.dumps(self._to_blob(value or ()), ensure_ascii=False, separators=(",", ":"))
+        blob = f"{version}:{base64.b64encode(zlib.compress(data.encode())).decode()}"
+        return bool(self._publish_blob(keys=[self.version_key, self.snapshot_key], args=[version, blob]))
+
+    def publish_snapshot_blob(self) -> bool:
+        """
+        read the whole value and publish its blob, e.g. from a compactor process
+        right after a bulk write. Return False if the version moved meanwhile
+        """
+        pipeline = self.redis_client.pipeline()
+        self._queue_load(pipeline)
+        version, value = pipeline.execute()
+        return self._store_blob(version or "0", value)
+
+    def _parse_fetched(self, value: list) -> Any:
+        """
+        turn the lua reply of FETCH_COMMAND into the reply redis-py would give
+        """
+        raise NotImplementedError
+
+    def refresh(self) -> None:
+        started = time.perf_counter()
+        if self.snapshot_key:
+            version, value = self._load_blob()
+        elif self.scan_count:
+            version, value = self._scan_consistently()
+        else:
+            version, value = self._load()
+        self._swap(int(version or 0), value)
+        self.metrics.observe_refresh(time.perf_counter() - started)
+
+    def _swap(self, version: int, value: Any, touched: Optional[Set] = None) -> None:
+        """
+        replace the snapshot by a completely built one, `touched` are the
+        only keys that can differ from the previous one, None if unknown
+        """
+        if self.snapshot_path and time.perf_counter() >= self._saved_at + self.SNAPSHOT_INTERVAL:
+            self.save_snapshot(version, value)
+        # a write-behind submit can't land between the replay and the swap
+        with self._swap_lock, self._buffer_lock:
+            # redis may not have our buffered writes yet, keep them visible
+            for op in self._flushing + self._buffer:
+                self._apply_op(value, op)
+            old = self._value
+            self.version = version
+            self._value = value
+            self._swaps += 1
+            self.metrics.swapped_at = time.monotonic()
+            self._snapshot_changed()
+            if self._callbacks:
+                self._notify(self._diff(old, value, touched))
+        self._deliver()
+
+    def _snapshot_changed(self) -> None:
+        """
+        called after `self._value` was replaced or written, before the callbacks
+        """
+
+    def on_change(self, callback: Callable[[CacheChange], None]) -> Callable[[CacheChange], None]:
+        """
+        call `callback` with a CacheChange after every refresh or local write that
+        changed the snapshot, so derived structures can be updated incrementally.
+        The diff is computed once for all the callbacks, from the changelog keys
+        when the refresh replayed it, and only while a callback is registered.
+        Callbacks run in order on the refreshing or writing thread, after the
+        snapshot locks are released, and should be quick; the changes before
+        the subscription are not replayed. Usable as a decorator:
+
+            @USER_CACHE.on_change
+            def reindex(change):
+                ...
+        """
+        self._callbacks.append(callback)
+        return callback
+
+    def remove_on_change(self, callback: Callable[[CacheChange], None]) -> None:
+        self._callbacks.remove(callback)
+
+    def _notify(self, change: CacheChange) -> None:
+        """
+        queue a change computed under the snapshot locks, _deliver calls the
+        callbacks once they are released
+        """
+        if change.added or change.removed or change.changed:
+            self._changes.append(change)
+
+    def _deliver(self) -> None:
+        """
+        call the callbacks with the queued changes in order. One thread delivers
+        at a time, the others leave their changes to it; a change queued by a
+        callback is delivered after it returns
+        """
+        while self._changes:
+            if not self._deliver_lock.acquire(blocking=False):
+                return
+            try:
+                while self._changes:
+                    change = self._changes.popleft()
+                    for callback in list(self._callbacks):
+                        try:
+                            callback(change)
+                        except Exception:
+                            LOGGER.exception("change callback of %s failed", self.value_key)
+            finally:
+                self._deliver_lock.release()
+
+    def _scan_consistently(self) -> Tuple[Optional[str], Any]:
+        for _ in range(self.SCAN_RETRIES):
+            version = self.redis_client.get(self.version_key)
+            value = self._scan()
+            if self.redis_client.get(self.version_key) == version:
+                return version, value
+        # the key keeps changing during the scan, fall back to one atomic read
+        return self._load()
+
+    def invalidate(self) -> None:
+        """
+        check the version on next access
+        """
+        self.expire_at = 0
+        self._wakeup.set()
+        if self.registry:
+            self.registry.expire_at = 0
+
+    def close(self) -> None:
+        if self.watcher:
+            self.watcher.close()
+        self._stopped.set()
+        if self.refresher:
+            self._wakeup.set()
+            self.refresher.join()
+        if self.flusher:
+            self.flusher.join()
+        self.flush()
+        self.save_snapshot()
+        _WRITE_BEHIND_CACHES.discard(self)
+        _SNAPSHOT_CACHES.discard(self)
+
+    def refresh_in_need(self) -> None:
+        if self.refresher:
+            if self.version == -1:
+                # nothing to serve yet, load it now instead of waiting for the thread
+                self._check_version_once()
+            return
+        if self.registry:
+            self.registry.refresh_in_need()
+            if self.version == -1:
+                # another thread checks the registry, don't serve the empty value
+                self._check_version_once()
+            return
+        if self.version != -1 and time.perf_counter() < self.expire_at:
+            return
+        self._check_version_once()
+
+    def _check_version_once(self) -> None:
+        """
+        check the version unless another thread is already doing it, readers
+        then keep the previous snapshot instead of sending the same commands.
+        Only a cache that was never loaded waits for the other thread
+        """
+        if not self._refresh_lock.acquire(blocking=self.version == -1):
+            return
+        try:
+            if self.version != -1 and time.perf_counter() < self.expire_at:
+                return
+            self.check_version()
+        finally:
+            self._refresh_lock.release()
+
+    def check_version(self) -> None:
+        """
+        compare the local version with redis and refresh the snapshot if
+        it moved, regardless of `expire_at`
+        """
+        self.checked_at = time.perf_counter()
+        self.expire_at = self.checked_at + self.timeout
+        self.metrics.version_checks += 1
+        if self._fetch:
+            changed = self._check_version_with_script()
+        else:
+            changed = self._check_version()
+        if self.max_timeout:
+            self._adapt_timeout(changed)
+
+    def fresh(self, max_age: float) -> "FastCache":
+        """
+        check the version now if the last check is older than `max_age` seconds,
+        and return the cache, so call sites with a tighter budget than `timeout`
+        can share the instance:
+
+            FLAGS.fresh(0.5).get("kill_switch")
+
+        Concurrent callers wait for one check. With shared_path the snapshot
+        file can still be as old as the timeout of the shared store
+        """
+        if time.perf_counter() - self.checked_at <= max_age:
+            return self
+        with self._refresh_lock:
+            if time.perf_counter() - self.checked_at > max_age:
+                self.check_version()
+        return self
+
+    def _check_version(self) -> bool:
+        """
+        bring the snapshot to the version of redis, return whether it moved
+        """
+        version = int(self.redis_client.get(self.version_key) or 0)
+        if version == self.version:
+            return False
+        if self.changelog:
+            changes = self.changelog.read(self.version, version)
+            if changes is not None:
+                self.apply_changes(version, changes)
+                return True
+        self.refresh()
+        return True
+
+    def _adapt_timeout(self, changed: bool) -> None:
+        """
+        check again after `min_timeout` when the version moved, double the
+        interval up to `max_timeout` while it stays the same
+        """
+        if changed:
+            self.timeout = self.min_timeout
+        else:
+            self.timeout = min(self.timeout * 2, self.max_timeout)
+        self.expire_at = time.perf_counter() + self.timeout * self._jitter
+
+    def _check_version_with_script(self) -> bool:
+        started = time.perf_counter()
+        keys = [self.version_key, self.value_key]
+        if self.changelog:
+            keys.append(self.changelog.key)
+        reply = self._fetch(  # type: ignore[misc]
+            keys=keys,
+            args=[self.version, self.FETCH_COMMAND, self.changelog.size if self.changelog else 0],
+        )
+        version = int(reply[0])
+        if len(reply) == 1:
+            return False
+        if reply[1] == "changes":
+            changes = self.changelog.parse(self.version, version, reply[2])  # type: ignore[union-attr]
+            if changes is None:
+                self.refresh()
+            else:
+                self.apply_changes(version, changes)
+            return True
+        self._swap(version, self._build_loaded(self._parse_fetched(reply[2])))
+        self.metrics.observe_refresh(time.perf_counter() - started)
+        return True
+
+    def apply_changes(self, version: int, changes: List[List[list]]) -> None:
+        """
+        replay the operations read from the changelog on a copy of the
+        local value, so readers never see a half applied snapshot
+        """
+        started = time.perf_counter()
+        value = self._copy(self._value)
+        touched: Optional[Set] = set() if self._callbacks else None
+        for ops in changes:
+            for op in ops:
+                self._apply_op(value, op)
+            if touched is not None:
+                keys = self._touched(ops)
+                touched = None if keys is None else touched | keys
+        self._swap(version, value, touched)
+        self.metrics.observe_refresh(time.perf_counter() - started, delta=True)
+
+    def queue_refresh(self, pipeline, version: int) -> int:
+        """
+        queue the commands bringing the snapshot to `version` into a pipeline
+        shared with other caches (see FastCacheRegistry), return how many
+        commands were queued; 0 means this cache can't share a pipeline
+        """
+        if self.changelog and self.changelog.covers(self.version, version):
+            pipeline.lrange(self.changelog.key, self.version - version, -1)
+            return 1
+        if self.scan_count or self.snapshot_key:
+            return 0
+        self._queue_load(pipeline)
+        return 2
+
+    def finish_refresh(self, version: int, results: list, seconds: float = 0.0) -> None:
+        """
+        consume the results of the commands queued by `queue_refresh`,
+        `seconds` is the duration of the shared pipeline
+        """
+        if len(results) == 1:
+            changes = self.changelog.parse(self.version, version, results[0])  # type: ignore[union-attr]
+            if changes is None:
+                self.refresh()
+            else:
+                self.apply_changes(version, changes)
+            return
+        version, value = results
+        self._swap(int(version or 0), self._build_loaded(value))
+        self.metrics.observe_refresh(seconds)
+
+    def update_local(self, ops: List[list]) -> None:
+        """
+        apply our own write to the local snapshot once redis accepted it
+        """
+        old, touched = None, None
+        callbacks = bool(self._callbacks)
+        if callbacks:
+            touched = self._touched(ops)
+            old = self._copy(self._value) if touched is None else self._pick(self._value, touched)
+        for op in ops:
+            self._apply_op(self._value, op)
+        self._snapshot_changed()
+        if callbacks:
+            self._notify(self._diff(old, self._value, touched))
+
+    def submit(self, ops: List[list]) -> None:
+        """
+        write the ops to redis, or buffer them in write-behind mode,
+        and apply them to the local snapshot
+        """
+        if not self.write_behind:
+            swaps = self._swaps
+            # Execute Redis operations first
+            version = self.write(ops)
+            with self._swap_lock:
+                # a snapshot of `version` or later already holds the write
+                if version > self.version:
+                    # Update local value only after Redis operation succeeds
+                    self.update_local(ops)
+                    # a snapshot swapped in meanwhile may have been read before the
+                    # write, then only the next check can bring the write
+                    if swaps == self._swaps:
+                        self._follow_own_write(version)
+            self._deliver()
+            return
+        with self._buffer_lock:
+            self.update_local(ops)
+            self._buffer.extend(ops)
+            full = len(self._buffer) >= self.write_behind_size
+        self._deliver()
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        send the buffered writes with one version increase
+        """
+        with self._flush_lock:
+            with self._buffer_lock:
+                ops, self._buffer = self._buffer, []
+                self._flushing = ops
+            if not ops:
+                return
+            try:
+                version = self.write(merge_ops(ops))
+            except Exception:
+                with self._buffer_lock:
+                    self._buffer[:0] = ops
+                    self._flushing = []
+                raise
+            with self._swap_lock:
+                # every snapshot swapped in meanwhile replayed the flushed ops
+                self._follow_own_write(version)
+                with self._buffer_lock:
+                    self._flushing = []
+
+    def _follow_own_write(self, version: int) -> None:
+        """
+        the write that increased the version to `version` is already applied
+        locally: if nobody else wrote since our snapshot, the snapshot is the
+        one of `version` and the next check has nothing to reload.
+        Called with _swap_lock held, only when the current snapshot is known
+        to hold the write
+        """
+        if version == self.version + 1:
+            self.version = version
+
+    def write(self, ops: List[list]) -> int:
+        """
+        execute the write operations and increase the version in one
+        round trip, return the new version
+        """
+        if self.changelog:
+            return self.changelog.record(ops)
+        pipeline = self.redis_client.pipeline()
+        queue_ops(pipeline, self.value_key, ops)
+        return pipeline.incr(self.version_key).execute()[-1]
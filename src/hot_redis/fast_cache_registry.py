@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import threading
+import time
+import weakref
+
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from redis.cluster import RedisCluster
+
+if TYPE_CHECKING:
+    from hot_redis.fast_cache import FastCache
+
+
+class FastCacheRegistry:
+    """
+    Check the versions of many fast caches with one pipeline per redis client
+    and refresh the changed ones with one more pipeline, instead of one
+    round trip per cache and per timeout.
+    usage:
+
+        REGISTRY = FastCacheRegistry(timeout=5)
+        WATCHING_USERS = DelayButFastSet(client, key="WATCHING_USERS", version="v2", registry=REGISTRY)
+        USER_CACHE = DelayButFastDict(client, key="USER_CACHE", registry=REGISTRY)
+        "123" in WATCHING_USERS  # checks both caches when the registry expired
+
+    The caches are held weakly. With RedisCluster the commands are sorted by
+    hash slot and the cluster pipeline sends them to each node in one batch.
+    """
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self.expire_at = time.perf_counter()
+        self.caches: "weakref.WeakSet[FastCache]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def register(self, cache: "FastCache") -> None:
+        self.caches.add(cache)
+        # let the new cache be loaded on its first read
+        self.expire_at = 0
+
+    def refresh_in_need(self) -> None:
+        if time.perf_counter() < self.expire_at:
+            return
+        # single flight, see FastCache._check_version_once
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if time.perf_counter() >= self.expire_at:
+                self.check_versions()
+        finally:
+            self._lock.release()
+
+    def check_versions(self) -> None:
+        self.expire_at = time.perf_counter() + self.timeout
+        groups: Dict[int, List["FastCache"]] = {}
+        for cache in list(self.caches):
+            groups.setdefault(id(cache.redis_client), []).append(cache)
+        for caches in groups.values():
+            self._check_group(caches)
+
+    def _check_group(self, caches: List["FastCache"]) -> None:
+        redis_client = caches[0].redis_client
+        if isinstance(redis_client, RedisCluster):
+            caches.sort(key=lambda cache: redis_client.keyslot(cache.version_key))
+
+        checked_at = time.perf_counter()
+        pipeline = redis_client.pipeline()
+        for cache in caches:
+            cache.checked_at = checked_at
+            cache.metrics.version_checks += 1
+            pipeline.get(cache.version_key)
+        changed = [
+                (cache, int(version or 0))
+                for cache, version in zip(caches, pipeline.execute())
+                if int(version or 0) != cache.version
+        ]
+        if not changed:
+            return
+
+        pipeline = redis_client.pipeline()
+        queued: List[Tuple["FastCache", int, int]] = []
+        for cache, version in changed:
+            count = cache.queue_refresh(pipeline, version)
+            if count:
+                queued.append((cache, version, count))
+            else:
+                cache.check_version()
+        if not queued:
+            return
+        started = time.perf_counter()
+        results = pipeline.execute()
+        seconds = time.perf_counter() - started
+        start = 0
+        for cache, version, count in queued:
+            cache.finish_refresh(version, results[start:start + count], seconds)
+            start += count
@@ -2,19 +2,68 @@
 # -*- coding: utf-8 -*-
 
 
-import random
+import sys
 import time
 
-from typing import Dict, TypeVar, Generic, Union, Optional
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Set, Tuple, TypeVar, Generic, Union, Optional
 
-from redis import Redis
+from hot_redis.codecs import Codec, get_codec
+from hot_redis.fast_cache import CacheChange, FastCache, bulk_ops
+from hot_redis.shared_snapshot import SharedSnapshot, SharedSnapshotStore
 
 
 K = TypeVar('K', bound=Union[str, int, float])
 V = TypeVar('V', bound=Union[str, int, float])
 
+_ABSENT = object()
+_NO_FIELDS: FrozenSet[str] = frozenset()
 
-class DelayButFastDict(Generic[K, V]):
+
+class _OwnWrites(Mapping[str, str]):
+    """
+    a shared snapshot with the writes of this process on top, until a
+    snapshot of their version is published
+    """
+
+    def __init__(self, base: Mapping[str, str], writes: Dict[str, Tuple[int, Any]], cleared: int):
+        """
+        params:
+            writes: {field: (version, value or _ABSENT)}
+            cleared: the version of our last clear(), 0 if the base is still valid
+        """
+        self.base = base
+        self.writes = writes
+        self.cleared = cleared
+
+    def __getitem__(self, key: str) -> str:
+        if key in self.writes:
+            item = self.writes[key][1]
+            if item is _ABSENT:
+                raise KeyError(key)
+            return item
+        if self.cleared:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __contains__(self, key: object) -> bool:
+        if key in self.writes:
+            return self.writes[key][1] is not _ABSENT  # type: ignore[index]
+        return not self.cleared and key in self.base
+
+    def __iter__(self) -> Iterator[str]:
+        for key, (_, item) in self.writes.items():
+            if item is not _ABSENT:
+                yield key
+        if not self.cleared:
+            for key in self.base:
+                if key not in self.writes:
+                    yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class DelayButFastDict(FastCache, Generic[K, V]):
     """
     This class will read data from redis periodically and keep data in memory
     usage:
@@ -26,34 +75,180 @@ class DelayButFastDict(Generic[K, V]):
 
         USER_CACHE = DelayButFastDict(Redis(decode_responses=True), key="USER_CACHE", timeout=5)  
         USER_CACHE["123"]  # "user_data"
+
+        SETTINGS = DelayButFastDict(Redis(decode_responses=True), key="SETTINGS", codec="json")
+        SETTINGS["limits"] = {"rps": 10}
+        SETTINGS["limits"]["rps"]  # 10, decoded once per refresh instead of on every read
+
+        @USER_CACHE.on_change
+        def reindex(change):
+            change.added, change.removed  # {field: value}
+            change.changed  # {field: (old, new)}
+
+        PROFILES = DelayButFastDict(Redis(decode_responses=True), key="PROFILES", codec="json")
+        PROFILES.add_index("team", lambda profile: profile.get("team"))
+        PROFILES.lookup("team", "infra")  # frozenset of the fields whose team is "infra"
     """
 
-    def __init__(self, redis_client=None, key="", timeout=10, startup_init: bool = False):
+    FETCH_COMMAND = "HGETALL"
+
+    def __init__(self, redis_client=None, key="", timeout=10, startup_init: bool = False,
+                 changelog_size: int = 0, shared_path: str = "",
+                 codec: Union[str, Codec] = "str", **kwargs):
         """
         params:
             startup_init: load data from redis on instance initialized
+            changelog_size: keep the last N writes in `{key}:changelog` so a refresh
+                only replays the changes since the local version. 0 disables the log
+            shared_path: share one snapshot file (e.g. under /dev/shm) between the
+                processes of a host, see hot_redis.shared_snapshot.SharedSnapshotStore.
+                Only one process per `timeout` talks to redis, lookups read the
+                memory mapped file
+            codec: "str", "int", "float", "json", "orjson" or a hot_redis.codecs.Codec.
+                Values are encoded on write and decoded when the snapshot is loaded,
+                reads return the decoded objects. Can't be combined with shared_path
+            other params are documented in FastCache
         """
-        if redis_client is None:
-            redis_client = Redis(decode_responses=True)
         if not key:
             raise ValueError("key cannot be empty")
-        assert redis_client.get_encoder().decode_responses is True
-
-        self.redis_client = redis_client
-        # Use hash tags to ensure both keys are in the same Redis Cluster slot
-        self.value_key = f"{{{key}}}:value"
-        self.version_key = f"{{{key}}}:version"
-
-        self.timeout = timeout
-        self._value: Dict[str, str] = {}
-
-        if startup_init:
-            self.expire_at = time.perf_counter() + random.random() * timeout
-            self.version = 0
-            self.refresh()
-        else:
-            self.expire_at = time.perf_counter()
-            self.version = -1
+        self.codec = get_codec(codec)
+        if shared_path and not self.codec.passthrough:
+            raise ValueError("codec can't be used with shared_path")
+        if shared_path and kwargs.get("write_behind"):
+            raise ValueError("write_behind can't be used with shared_path")
+        if shared_path and kwargs.get("snapshot_path"):
+            raise ValueError("snapshot_path can't be used with shared_path")
+        self._value: Mapping[str, Any]
+        # name: (index function, {index key: fields})
+        self._indexes: Dict[str, Tuple[Callable[[Any], Any], Dict[Any, FrozenSet[str]]]] = {}
+        self.shared: Optional[SharedSnapshotStore] = None
+        if shared_path:
+            self.shared = SharedSnapshotStore(shared_path)
+        # shared_path: our writes not in the shared snapshot yet, see _OwnWrites
+        self._own_writes: Dict[str, Tuple[int, Any]] = {}
+        self._own_cleared = 0
+        # Use hash tags to ensure all keys are in the same Redis Cluster slot
+        super().__init__(
+            redis_client,
+            value_key=f"{{{key}}}:value",
+            version_key=f"{{{key}}}:version",
+            timeout=timeout,
+            startup_init=startup_init and not self.shared,
+            changelog_key=f"{{{key}}}:changelog",
+            changelog_size=changelog_size,
+            snapshot_key=f"{{{key}}}:snapshot",
+            **kwargs,
+        )
+        if startup_init and self.shared:
+            self.check_version()
+
+    def _empty(self) -> Dict[str, str]:
+        return {}
+
+    def _copy(self, value: Mapping[str, str]) -> Dict[str, str]:
+        return dict(value)
+
+    def _build(self, value: Optional[Dict[str, str]]) -> Dict[str, Any]:
+        if not value:
+            return {}
+        if self.codec.passthrough:
+            return value
+        decode = self.codec.decode
+        return {field: decode(item) for field, item in value.items()}
+
+    def _apply_op(self, value: Dict[str, Any], op: list) -> None:
+        if op[0] == "hset":
+            value.update(zip(op[1::2], map(self.codec.decode, op[2::2])))
+        elif op[0] == "hdel":
+            for field in op[1:]:
+                value.pop(field, None)
+        elif op[0] == "del":
+            value.clear()
+
+    def _touched(self, ops: List[list]) -> Optional[Set[str]]:
+        touched: Set[str] = set()
+        for op in ops:
+            if op[0] == "del":
+                return None
+            touched.update(op[1::2] if op[0] == "hset" else op[1:])
+        return touched
+
+    def _pick(self, value: Mapping[str, Any], keys: Set[str]) -> Dict[str, Any]:
+        return {field: value[field] for field in keys if field in value}
+
+    def _diff(self, old: Mapping[str, Any], new: Mapping[str, Any],
+              keys: Optional[Set[str]] = None) -> CacheChange:
+        if keys is None:
+            keys = set(old).union(new)
+        added: Dict[str, Any] = {}
+        removed: Dict[str, Any] = {}
+        changed: Dict[str, Any] = {}
+        for field in keys:
+            previous = old.get(field, _ABSENT)
+            item = new.get(field, _ABSENT)
+            if previous is _ABSENT:
+                if item is not _ABSENT:
+                    added[field] = item
+            elif item is _ABSENT:
+                removed[field] = previous
+            elif item != previous:
+                changed[field] = (previous, item)
+        return CacheChange(added, removed, changed)
+
+    def add_index(self, name: str, key: Optional[Callable[[V], Any]] = None) -> None:
+        """
+        maintain a lookup table {key(value): fields} for lookup(name, ...). It is built
+        once from the current snapshot, then updated from the on_change diffs of the
+        refreshes and local writes, touching only the changed fields.
+        params:
+            key: the index key of a value, the value itself by default (reverse
+                lookup). None leaves the field out of the index. Must not raise
+        """
+        if name in self._indexes:
+            raise ValueError(f"index {name} already exists")
+        key = key or (lambda value: value)
+        self.refresh_in_need()
+        # no swap nor local write between the build and the subscription
+        with self._swap_lock, self._buffer_lock:
+            if self._reindex not in self._callbacks:
+                self.on_change(self._reindex)
+            groups: Dict[Any, Set[str]] = {}
+            for field, value in self._value.items():
+                index_key = key(value)
+                if index_key is not None:
+                    groups.setdefault(index_key, set()).add(field)
+            self._indexes[name] = (key, {index_key: frozenset(fields) for index_key, fields in groups.items()})
+
+    def lookup(self, name: str, value: Any) -> FrozenSet[str]:
+        """
+        the fields whose value has the index key `value` in the index `name`
+        """
+        self.refresh_in_need()
+        return self._indexes[name][1].get(value, _NO_FIELDS)
+
+    def _reindex(self, change: CacheChange) -> None:
+        for key, table in self._indexes.values():
+            removed: Dict[Any, Set[str]] = {}
+            added: Dict[Any, Set[str]] = {}
+            for field, value in change.removed.items():
+                removed.setdefault(key(value), set()).add(field)
+            for field, value in change.added.items():
+                added.setdefault(key(value), set()).add(field)
+            for field, (old, new) in change.changed.items():
+                old_key, new_key = key(old), key(new)
+                if old_key != new_key:
+                    removed.setdefault(old_key, set()).add(field)
+                    added.setdefault(new_key, set()).add(field)
+            removed.pop(None, None)
+            added.pop(None, None)
+            # one new frozenset per touched index key, readers never see it half updated
+            for index_key in removed.keys() | added.keys():
+                fields = table.get(index_key, _NO_FIELDS).difference(
+                    removed.get(index_key, ())).union(added.get(index_key, ()))
+                if fields:
+                    table[index_key] = fields
+                else:
+                    table.pop(index_key, None)
 
     def __contains__(self, key: K) -> bool:
         self.refresh_in_need()
@@ -67,44 +262,126 @@ class DelayButFastDict(Generic[K, V]):
         return self._value[str_key]  # type: ignore
 
     def __setitem__(self, key: K, value: V) -> None:
-        str_key = str(key)
-        str_value = str(value)
-        # Execute Redis operations first
-        self.redis_client.pipeline()\
-                .hset(self.value_key, str_key, str_value)\
-                .incr(self.version_key)\
-                .execute()
-        # Update local value only after Redis operation succeeds
-        self._value[str_key] = str_value
-        # Local version will be updated on next refresh
+        ops = [["hset", str(key), self.codec.encode(value)]]
+        self.submit(ops)
 
     def __delitem__(self, key: K) -> None:
-        str_key = str(key)
-        # Execute Redis operations first
-        self.redis_client.pipeline()\
-                .hdel(self.value_key, str_key)\
-                .incr(self.version_key)\
-                .execute()
-        # Update local value only after Redis operation succeeds
-        if str_key in self._value:
-            del self._value[str_key]
-        # Local version will be updated on next refresh
+        ops = [["hdel", str(key)]]
+        self.submit(ops)
 
-    def refresh_in_need(self) -> None:
-        if time.perf_counter() < self.expire_at:
+    def submit(self, ops: List[list]) -> None:
+        if not self.shared:
+            super().submit(ops)
             return
-        self.expire_at = time.perf_counter() + self.timeout
-        if int(self.redis_client.get(self.version_key) or 0) == self.version:
+        version = self.write(ops)
+        # the shared snapshot is read only: keep our write on top of it until a
+        # snapshot of its version is published, and let the next read publish one
+        with self._swap_lock:
+            writes = dict(self._own_writes)
+            for op in ops:
+                if op[0] == "hset":
+                    writes.update((field, (version, item)) for field, item in zip(op[1::2], op[2::2]))
+                elif op[0] == "hdel":
+                    writes.update((field, (version, _ABSENT)) for field in op[1:])
+                elif op[0] == "del":
+                    writes.clear()
+                    self._own_cleared = version
+            self._own_writes = writes
+            old = self._value
+            base = old.base if isinstance(old, _OwnWrites) else old
+            self._value = self._with_own_writes(base, self.version)
+            self._snapshot_changed()
+            if self._callbacks:
+                self._notify(self._diff(old, self._value, self._touched(ops)))
+        self.shared.expire()
+        self.invalidate()
+        self._deliver()
+
+    def _with_own_writes(self, base: Mapping[str, str], version: int) -> Mapping[str, str]:
+        """
+        `base`, a snapshot of `version`, with our writes it doesn't hold yet on top
+        """
+        if not self._own_writes and not self._own_cleared:
+            return base
+        self._own_writes = {
+            field: entry for field, entry in self._own_writes.items() if entry[0] > version
+        }
+        if self._own_cleared <= version:
+            self._own_cleared = 0
+        if not self._own_writes and not self._own_cleared:
+            return base
+        return _OwnWrites(base, self._own_writes, self._own_cleared)
+
+    def queue_refresh(self, pipeline, version: int) -> int:
+        if self.shared:
+            return 0
+        return super().queue_refresh(pipeline, version)
+
+    def check_version(self) -> None:
+        if not self.shared:
+            super().check_version()
             return
-        self.refresh()
+        self.expire_at = time.perf_counter() + self.timeout
+        try:
+            with self.shared.due(self.timeout) as due:
+                snapshot = self.shared.load()
+                if snapshot is not None:
+                    with self._swap_lock:
+                        old, version = self._value, self.version
+                        self.version = snapshot.version
+                        self._value = self._with_own_writes(snapshot, snapshot.version)
+                        self._swaps += 1
+                        if snapshot.version != version:
+                            self._snapshot_changed()
+                            if self._callbacks:
+                                self._notify(self._diff(old, self._value))
+                    if not due:
+                        return
+                # our turn to check redis, or nothing was published yet
+                super().check_version()
+                if due and (snapshot is None or snapshot.version != self.version):
+                    self.shared.publish(self.version, self._value)
+                    with self._swap_lock:
+                        published = self.shared.load()
+                        self._value = self._with_own_writes(published, published.version)  # type: ignore[union-attr]
+        finally:
+            # the change of the shared snapshot, once the _swap_lock is released
+            self._deliver()
+
+    def _queue_load(self, pipeline) -> None:
+        pipeline.get(self.version_key)\
+                .hgetall(self.value_key)
+
+    def _dump(self, value: Mapping[str, Any]) -> Mapping[str, str]:
+        if self.codec.passthrough:
+            return value
+        encode = self.codec.encode
+        return {field: encode(item) for field, item in value.items()}
+
+    def _restore(self, snapshot: Mapping[str, str]) -> Dict[str, Any]:
+        return self._build(dict(snapshot.items()))
+
+    def _payload_size(self, value: Dict[str, str]) -> int:
+        return sum(len(field) + len(item) for field, item in value.items())
 
-    def refresh(self) -> None:
-        version, value = self.redis_client.pipeline()\
-                .get(self.version_key)\
-                .hgetall(self.value_key)\
-                .execute()
-        self.version = int(version or 0)
-        self._value = value or {}
+    def _memory(self, value: Mapping[str, Any]) -> int:
+        if isinstance(value, SharedSnapshot):
+            return value.nbytes
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(field) + sys.getsizeof(item) for field, item in value.items()
+        )
+
+    def _to_blob(self, value: Dict[str, str]) -> Dict[str, str]:
+        return value
+
+    def _from_blob(self, value: Dict[str, str]) -> Dict[str, str]:
+        return value
+
+    def _parse_fetched(self, value: list) -> Dict[str, str]:
+        return dict(zip(value[::2], value[1::2]))
+
+    def _scan(self) -> Dict[str, Any]:
+        return self._build_loaded(dict(self.redis_client.hscan_iter(self.value_key, count=self.scan_count)))
 
     def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
         self.refresh_in_need()
@@ -131,18 +408,33 @@ class DelayButFastDict(Generic[K, V]):
             raise
 
     def update(self, *args, **kwargs) -> None:
-        if args:
-            if len(args) > 1:
-                raise TypeError(f"update expected at most 1 argument, got {len(args)}")
-            other = args[0]
-            if hasattr(other, "keys"):
-                for key in other.keys():
-                    self[key] = other[key]
-            else:
-                for key, value in other:
-                    self[key] = value
-        for key, value in kwargs.items():
-            self[key] = value
+        if len(args) > 1:
+            raise TypeError(f"update expected at most 1 argument, got {len(args)}")
+        self.set_many(dict(*args, **kwargs))
+
+    def set_many(self, mapping: Mapping[K, V]) -> None:
+        """
+        write all the items with one round trip and one version increase,
+        so the readers refresh only once
+        """
+        ops = bulk_ops("hset", [
+            field
+            for key, value in mapping.items()
+            for field in (str(key), self.codec.encode(value))
+        ], 2)
+        if not ops:
+            return
+        self.submit(ops)
+
+    def delete_many(self, keys: Iterable[K]) -> None:
+        """
+        delete the keys with one round trip and one version increase,
+        missing keys are ignored
+        """
+        ops = bulk_ops("hdel", [str(key) for key in keys])
+        if not ops:
+            return
+        self.submit(ops)
 
     def keys(self):
         self.refresh_in_need()
@@ -157,14 +449,8 @@ class DelayButFastDict(Generic[K, V]):
         return self._value.items()
 
     def clear(self) -> None:
-        # Execute Redis operations first
-        self.redis_client.pipeline()\
-                .delete(self.value_key)\
-                .incr(self.version_key)\
-                .execute()
-        # Update local value only after Redis operation succeeds
-        self._value.clear()
-        # Local version will be updated on next refresh
+        ops = [["del"]]
+        self.submit(ops)
 
     def __iter__(self):
         self.refresh_in_need()
@@ -2,19 +2,20 @@
 # -*- coding: utf-8 -*-
 
 
-import random
 import time
 import warnings
 
-from typing import Set, TypeVar, Generic, Union
+from collections.abc import Set as AbstractSet
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, TypeVar, Generic, Union
 
-from redis import Redis
+from hot_redis.fast_cache import CacheChange, FastCache, bulk_ops
+from hot_redis.int_set import IntSet
 
 
 T = TypeVar('T', bound=Union[str, int, float])
 
 
-class DelayButFastSet(Generic[T]):
+class DelayButFastSet(FastCache, Generic[T]):
     """
     this class will read data from redis periodly and keep data in memory
     usage:
@@ -26,23 +27,34 @@ class DelayButFastSet(Generic[T]):
 
         WATCHING_USERS = DelayBuyFastSet(Redis(decode_responses=True), key="WATCHING_USERS", timeout=5)
         "123" in WATCHING_USERS  # True
+
+        # high rate writers: buffer the adds and send them every 0.5 seconds
+        SEEN = DelayButFastSet(Redis(decode_responses=True), key="SEEN", version="v2", write_behind=0.5)
     """
 
-    def __init__(self, redis_client=None, key="", timeout=10, startup_init: bool = False, version="v1"):
+    FETCH_COMMAND = "SMEMBERS"
+
+    def __init__(self, redis_client=None, key="", timeout=10, startup_init: bool = False, version="v1",
+                 changelog_size: int = 1000, int_members: bool = False, **kwargs):
         """
         params:
             startup_init: load data from redis on instance initialized
-            version: "v1" (legacy) or "v2" (improved refresh behavior)
+            version: "v1" (legacy), "v2" (improved refresh behavior) or
+                "v3" (v2 plus a changelog, a refresh only replays the added/removed members)
+            changelog_size: how many writes the v3 changelog keeps
+            int_members: every member is a 64 bit integer, keep them in a compact
+                sorted array (hot_redis.int_set.IntSet) instead of a set of str.
+                Iteration then yields int
+            other params are documented in FastCache
         """
-        if redis_client is None:
-            redis_client = Redis(decode_responses=True)
         if not key:
             raise ValueError
-        assert redis_client.get_encoder().decode_responses is True
 
         # Version compatibility handling
-        if version not in ("v1", "v2"):
-            raise ValueError("version must be 'v1' or 'v2'")
+        if version not in ("v1", "v2", "v3"):
+            raise ValueError("version must be 'v1', 'v2' or 'v3'")
+        if version == "v1" and (kwargs.get("conditional_fetch") or kwargs.get("snapshot_blob")):
+            raise ValueError("conditional_fetch and snapshot_blob need version 'v2' or 'v3'")
         
         if version == "v1":
             warnings.warn(
@@ -54,93 +66,165 @@ class DelayButFastSet(Generic[T]):
             )
 
         self.version_mode = version
-        self.redis_client = redis_client
-        # Use hash tags to ensure both keys are in the same Redis Cluster slot
+        self.int_members = int_members
+        # the frozenset returned by snapshot(), until the snapshot changes
+        self._frozen: Optional[FrozenSet] = None
+        self._value: Union[Set[str], IntSet]
+        # Use hash tags to ensure all keys are in the same Redis Cluster slot
         if version == "v1":
-            self.value_key = f"{key}:value"
-            self.version_key = f"{key}:version"
+            value_key = f"{key}:value"
+            version_key = f"{key}:version"
         else:
-            self.value_key = f"{{{key}}}:value"
-            self.version_key = f"{{{key}}}:version"
+            value_key = f"{{{key}}}:value"
+            version_key = f"{{{key}}}:version"
+        super().__init__(
+            redis_client,
+            value_key=value_key,
+            version_key=version_key,
+            timeout=timeout,
+            startup_init=startup_init,
+            changelog_key=f"{{{key}}}:changelog",
+            changelog_size=changelog_size if version == "v3" else 0,
+            snapshot_key=f"{{{key}}}:snapshot",
+            **kwargs,
+        )
+
+    def _empty(self) -> Union[Set[str], IntSet]:
+        if self.int_members:
+            return IntSet()
+        return set()
+
+    def _copy(self, value: Union[Set[str], IntSet]) -> Union[Set[str], IntSet]:
+        return value.copy()
+
+    def _build(self, value: Set[str]) -> Union[Set[str], IntSet]:
+        if self.int_members:
+            return IntSet(value or ())
+        return value or set()
+
+    def _apply_op(self, value: Union[Set[str], IntSet], op: list) -> None:
+        if op[0] == "sadd":
+            value.update(op[1:])
+        elif op[0] == "srem":
+            value.difference_update(op[1:])
+        elif op[0] == "del":
+            value.clear()
+
+    def _touched(self, ops: List[list]) -> Optional[Set]:
+        touched: Set = set()
+        for op in ops:
+            if op[0] == "del":
+                return None
+            touched.update(op[1:])
+        if self.int_members:
+            return set(map(int, touched))
+        return touched
 
-        self.timeout = timeout
-        self._value: Set[str] = set()
+    def _pick(self, value: Union[Set[str], IntSet], keys: Set) -> Set:
+        return {member for member in keys if member in value}
 
-        if startup_init:
-            self.expire_at = time.perf_counter() + random.random() * timeout
-            self.version = 0
-            self.refresh()
+    def _diff(self, old: AbstractSet, new: AbstractSet, keys: Optional[Set] = None) -> CacheChange:
+        if keys is None:
+            added = {member for member in new if member not in old}
+            removed = {member for member in old if member not in new}
         else:
-            self.expire_at = time.perf_counter()
-            self.version = -1
+            added = {member for member in keys if member in new and member not in old}
+            removed = {member for member in keys if member in old and member not in new}
+        return CacheChange(added, removed, set())
 
     def __contains__(self, value: T) -> bool:
         self.refresh_in_need()
+        if self.int_members:
+            return value in self._value
         return str(value) in self._value
 
-    def refresh_in_need(self) -> None:
-        if time.perf_counter() < self.expire_at:
-            return
-        self.expire_at = time.perf_counter() + self.timeout
-        if int(self.redis_client.get(self.version_key) or 0) == self.version:
-            return
-        self.refresh()
-
     def refresh(self) -> None:
         if self.version_mode == "v1":
             # Legacy behavior: incorrectly increments version on refresh
-            self._value = self.redis_client.smembers(self.value_key)
-            self.version = self.redis_client.incr(self.version_key)
+            started = time.perf_counter()
+            value = self._build_loaded(self.redis_client.smembers(self.value_key))
+            self._swap(self.redis_client.incr(self.version_key), value)
+            self.metrics.observe_refresh(time.perf_counter() - started)
         else:
-            # v2 behavior: atomic read without incrementing version
-            version, value = self.redis_client.pipeline()\
-                    .get(self.version_key)\
-                    .smembers(self.value_key)\
-                    .execute()
-            self.version = int(version or 0)
-            self._value = value or set()
+            super().refresh()
+
+    def queue_refresh(self, pipeline, version: int) -> int:
+        if self.version_mode == "v1":
+            return 0
+        return super().queue_refresh(pipeline, version)
+
+    def _queue_load(self, pipeline) -> None:
+        # v2 behavior: atomic read without incrementing version
+        pipeline.get(self.version_key)\
+                .smembers(self.value_key)
+
+    def _dump(self, value: Union[Set[str], IntSet]) -> Dict[str, str]:
+        return dict.fromkeys(map(str, value), "")
+
+    def _restore(self, snapshot: Mapping[str, str]) -> Union[Set[str], IntSet]:
+        return self._build(set(snapshot))
+
+    def _memory(self, value: Union[Set[str], IntSet]) -> int:
+        if isinstance(value, IntSet):
+            return value.nbytes
+        return super()._memory(value)
+
+    def _to_blob(self, value: Set[str]) -> List[str]:
+        return list(value)
+
+    def _from_blob(self, value: List[str]) -> Set[str]:
+        return set(value)
+
+    def _parse_fetched(self, value: list) -> Set[str]:
+        return set(value)
+
+    def _scan(self) -> Union[Set[str], IntSet]:
+        return self._build_loaded(set(self.redis_client.sscan_iter(self.value_key, count=self.scan_count)))
+
+    def _member(self, value: T) -> str:
+        """
+        the member written to redis for `value`. With int_members a ValueError
+        is raised before any write if it is not a 64 bit integer, no reader
+        could load the set afterwards
+        """
+        if self.int_members:
+            return str(IntSet.member(value))
+        return str(value)
+
+    def _removable(self, values: Iterable[T]) -> List[str]:
+        """
+        the members to remove for `values`, skipping the ones that can't be members
+        """
+        if not self.int_members:
+            return [str(value) for value in values]
+        members = []
+        for value in values:
+            try:
+                members.append(self._member(value))
+            except ValueError:
+                pass
+        return members
 
     def add(self, value: T) -> None:
-        str_value = str(value)
-        # Execute Redis operations first
-        self.redis_client.pipeline()\
-                .sadd(self.value_key, str_value)\
-                .incr(self.version_key)\
-                .execute()
-        # Update local value only after Redis operation succeeds
-        self._value.add(str_value)
-        # Local version will be updated on next refresh
+        ops = [["sadd", self._member(value)]]
+        self.submit(ops)
 
     def discard(self, value: T) -> None:
-        str_value = str(value)
-        # Execute Redis operations first
-        self.redis_client.pipeline()\
-                .srem(self.value_key, str_value)\
-                .incr(self.version_key)\
-                .execute()
-        # Update local value only after Redis operation succeeds
-        self._value.discard(str_value)
-        # Local version will be updated on next refresh
+        members = self._removable([value])
+        if members:
+            self.submit([["srem", *members]])
 
     remove = discard
 
     def update(self, *values: T) -> None:
-        str_values = [str(value) for value in values]
-        if values:
-            # Execute Redis operations first
-            if self.version_mode == "v1":
-                # Legacy behavior: separate Redis calls, no pipeline, no local version sync
-                self.redis_client.sadd(self.value_key, *str_values)
-                self.redis_client.incr(self.version_key)
-            else:
-                # v2 behavior: pipeline without local version sync
-                self.redis_client.pipeline()\
-                        .sadd(self.value_key, *str_values)\
-                        .incr(self.version_key)\
-                        .execute()
-            # Update local value only after Redis operation succeeds
-            self._value.update(str_values)
-            # Local version will be updated on next refresh
+        ops = bulk_ops("sadd", [self._member(value) for value in values])
+        if ops:
+            self.submit(ops)
+
+    def discard_many(self, *values: T) -> None:
+        ops = bulk_ops("srem", self._removable(values))
+        if ops:
+            self.submit(ops)
 
     def __iter__(self):
         self.refresh_in_need()
@@ -158,12 +242,119 @@ class DelayButFastSet(Generic[T]):
             return f"DelayButFastSet:{self.value_key}:{self.version_key}: {self._value}"
         return f"DelayButFastSet:{self.value_key}:{self.version_key}: too many values..."
 
-    def __sub__(self, target):
+    def _snapshot_changed(self) -> None:
+        self._frozen = None
+
+    def snapshot(self) -> FrozenSet:
+        """
+        a read only copy of the members, built once and reused until the next change
+        """
         self.refresh_in_need()
+        frozen = self._frozen
+        if frozen is None:
+            # a change in between would reset _frozen before we store a stale copy
+            with self._swap_lock, self._buffer_lock:
+                frozen = self._frozen
+                if frozen is None:
+                    frozen = self._frozen = frozenset(self._value)
+        return frozen
+
+    def _members(self) -> AbstractSet:
+        self.refresh_in_need()
+        return self._value
+
+    def _operand(self, target: Iterable) -> AbstractSet:
+        """
+        the members of another DelayButFastSet, set or iterable, comparable to the
+        members of this set: converted to int for int_members, the members of an
+        IntSet converted to str otherwise; other operands are kept as they are.
+        Membership in an IntSet coerces str while a set of str never matches an int,
+        so mixed types would make the result depend on which side is iterated
+        """
         if isinstance(target, DelayButFastSet):
-            target.refresh_in_need()
-            return self._value - target._value
-        return self._value - target
+            other = target._members()
+        elif isinstance(target, AbstractSet):
+            other = target
+        else:
+            other = set(target)
+        if self.int_members:
+            if isinstance(other, IntSet):
+                return other
+            return {member for member in map(IntSet._probe, other) if member is not None}
+        if isinstance(other, IntSet):
+            return {str(member) for member in other}
+        return other
+
+    @staticmethod
+    def _as_set(value: AbstractSet) -> AbstractSet:
+        # IntSet only implements the Set mixins, build a set to use the C implementation
+        if isinstance(value, (set, frozenset)):
+            return value
+        return set(value)
+
+    def __and__(self, target):
+        if not isinstance(target, (AbstractSet, DelayButFastSet)):
+            return NotImplemented
+        return self.intersection(target)
+
+    __rand__ = __and__
+
+    def __or__(self, target):
+        if not isinstance(target, (AbstractSet, DelayButFastSet)):
+            return NotImplemented
+        return self.union(target)
+
+    __ror__ = __or__
+
+    def __xor__(self, target):
+        if not isinstance(target, (AbstractSet, DelayButFastSet)):
+            return NotImplemented
+        return self._as_set(self._members()) ^ self._as_set(self._operand(target))
+
+    __rxor__ = __xor__
+
+    def __sub__(self, target):
+        members = self._members()
+        other = self._operand(target)
+        return {member for member in members if member not in other}
+
+    def __rsub__(self, target):
+        if not isinstance(target, AbstractSet):
+            return NotImplemented
+        members = self._members()
+        return {member for member in target if member not in members}
+
+    def intersection(self, *targets: Iterable) -> Set:
+        members = self._members()
+        result: AbstractSet = members
+        for target in targets:
+            other = self._operand(target)
+            # test the members of the smaller side against the larger one
+            small, large = (result, other) if len(result) <= len(other) else (other, result)
+            result = {member for member in small if member in large}
+        return set(result) if result is members else result  # type: ignore[return-value]
+
+    def union(self, *targets: Iterable) -> Set:
+        result = set(self._members())
+        for target in targets:
+            result.update(self._operand(target))
+        return result
+
+    def isdisjoint(self, target: Iterable) -> bool:
+        members = self._members()
+        other = self._operand(target)
+        small, large = (members, other) if len(members) <= len(other) else (other, members)
+        return not any(member in large for member in small)
+
+    def issubset(self, target: Iterable) -> bool:
+        members = self._members()
+        other = self._operand(target)
+        return len(members) <= len(other) and all(member in other for member in members)
+
+    def issuperset(self, target: Iterable) -> bool:
+        members = self._members()
+        other = self._operand(target)
+        return len(members) >= len(other) and all(member in members for member in other)
 
     def __len__(self):
         self.refresh_in_need()
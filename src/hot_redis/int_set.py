@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import operator
+import sys
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Set
+from typing import Iterable, Iterator, Optional
+
+
+# the range of the members of an `array('q')`
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+
+class IntSet(Set):
+    """
+    Compact set of 64 bit integers kept in a sorted `array('q')`,
+    8 bytes per member instead of a python str in a python set.
+    Membership is a binary search; str members (as read from redis) are
+    converted with int(). Only probes standing for an integer can match:
+    "3", 3 and 3.0 can, 3.5, True and "03" can't.
+    """
+
+    def __init__(self, values: Iterable = ()):
+        self._array = array("q", sorted({int(value) for value in values}))
+
+    @staticmethod
+    def _coerce(value) -> int:
+        return value if type(value) is int else int(value)
+
+    @staticmethod
+    def _probe(value) -> Optional[int]:
+        """
+        the member `value` stands for, None if it can't be one
+        """
+        if type(value) is int:
+            return value
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, float):
+            return int(value) if value.is_integer() else None
+        if isinstance(value, str):
+            try:
+                number = int(value)
+            except ValueError:
+                return None
+            return number if str(number) == value else None
+        try:
+            return operator.index(value)
+        except TypeError:
+            return None
+
+    @classmethod
+    def member(cls, value) -> int:
+        """
+        the member `value` stands for, ValueError if it can't be one
+        """
+        number = cls._probe(value)
+        if number is None or not INT64_MIN <= number <= INT64_MAX:
+            raise ValueError(f"{value!r} is not a 64 bit integer")
+        return number
+
+    def __contains__(self, value) -> bool:
+        value = self._probe(value)
+        if value is None:
+            return False
+        index = bisect_left(self._array, value)
+        return index < len(self._array) and self._array[index] == value
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._array)
+
+    def __len__(self) -> int:
+        return len(self._array)
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self._array)
+
+    def __repr__(self) -> str:
+        return f"IntSet({set(self._array)})"
+
+    def copy(self) -> "IntSet":
+        value = IntSet()
+        value._array = array("q", self._array)
+        return value
+
+    def add(self, value) -> None:
+        value = self._coerce(value)
+        index = bisect_left(self._array, value)
+        if index == len(self._array) or self._array[index] != value:
+            self._array.insert(index, value)
+
+    def discard(self, value) -> None:
+        value = self._probe(value)
+        if value is None:
+            return
+        index = bisect_left(self._array, value)
+        if index < len(self._array) and self._array[index] == value:
+            del self._array[index]
+
+    def update(self, values: Iterable) -> None:
+        values = [self._coerce(value) for value in values]
+        if len(values) < 16:
+            for value in values:
+                self.add(value)
+        else:
+            self._array = array("q", sorted(set(self._array).union(values)))
+
+    def difference_update(self, values: Iterable) -> None:
+        values = [value for value in values if value in self]
+        if len(values) < 16:
+            for value in values:
+                self.discard(value)
+        else:
+            self._array = array("q", sorted(set(self._array).difference(map(self._coerce, values))))
+
+    def clear(self) -> None:
+        del self._array[:]
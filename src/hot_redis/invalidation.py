@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import threading
+import weakref
+
+from typing import Callable
+
+from redis.cluster import RedisCluster
+from redis.exceptions import ConnectionError, TimeoutError
+
+
+class VersionWatcher:
+    """
+    Call `callback` on a daemon thread whenever `key` is written, so the fast
+    caches know their version changed without polling it.
+
+    mode:
+        "tracking": server assisted client side caching. The version key is
+            tracked with `CLIENT TRACKING ON REDIRECT <id> BCAST PREFIX <key>`
+            and the invalidation messages are read from `__redis__:invalidate`
+            on a dedicated connection. Only works with a standalone Redis.
+        "keyspace": keyspace notifications, the server must be configured with
+            `notify-keyspace-events` containing `K$` (or `KA`).
+
+    The callback is also called every time the subscription is (re)established,
+    since a message may have been lost while disconnected.
+    The callback is held weakly, the watcher stops once its owner is collected.
+    """
+
+    def __init__(self, redis_client, key: str, callback: Callable[[], None], mode: str = "tracking"):
+        if mode not in ("tracking", "keyspace"):
+            raise ValueError("mode must be 'tracking' or 'keyspace'")
+        if mode == "tracking" and isinstance(redis_client, RedisCluster):
+            raise ValueError("tracking mode does not support RedisCluster, use 'keyspace'")
+        self.redis_client = redis_client
+        self.key = key
+        self.mode = mode
+        self._callback = weakref.WeakMethod(callback)  # type: ignore[arg-type]
+        self._stopped = threading.Event()
+        # set while the subscription is established
+        self.ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"VersionWatcher:{key}", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _running(self) -> bool:
+        return not self._stopped.is_set() and self._callback() is not None
+
+    def _notify(self) -> None:
+        callback = self._callback()
+        if callback is not None:
+            callback()
+
+    def _run(self) -> None:
+        while self._running():
+            try:
+                if self.mode == "tracking":
+                    self._listen_tracking()
+                else:
+                    self._listen_keyspace()
+            except (ConnectionError, TimeoutError, OSError):
+                self.ready.clear()
+                self._stopped.wait(1)
+
+    def _subscribed(self) -> None:
+        self._notify()
+        self.ready.set()
+
+    def _listen_tracking(self) -> None:
+        pool = self.redis_client.connection_pool
+        kwargs = dict(pool.connection_kwargs)
+        if "protocol" in kwargs:
+            # invalidations are read as plain pubsub messages
+            kwargs["protocol"] = 2
+            # redis-py >= 6 only supports maintenance notifications with RESP3
+            kwargs.pop("maint_notifications_config", None)
+            kwargs.pop("maint_notifications_pool_handler", None)
+        connection = pool.connection_class(**kwargs)
+        try:
+            connection.send_command("CLIENT", "ID")
+            client_id = connection.read_response()
+            connection.send_command(
+                "CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", "PREFIX", self.key)
+            connection.read_response()
+            connection.send_command("SUBSCRIBE", "__redis__:invalidate")
+            connection.read_response()
+            self._subscribed()
+            while self._running():
+                if not connection.can_read(timeout=1):
+                    continue
+                message = connection.read_response()
+                # a None payload means the whole keyspace was flushed
+                if message[0] == "message" and (message[2] is None or self.key in message[2]):
+                    self._notify()
+        finally:
+            connection.disconnect()
+
+    def _listen_keyspace(self) -> None:
+        if isinstance(self.redis_client, RedisCluster):
+            pubsub = self.redis_client.pubsub(node=self.redis_client.get_node_from_key(self.key))
+            db = 0
+        else:
+            pubsub = self.redis_client.pubsub()
+            db = self.redis_client.connection_pool.connection_kwargs.get("db", 0)
+        try:
+            pubsub.subscribe(f"__keyspace@{db}__:{self.key}")
+            pubsub.get_message(timeout=1)
+            self._subscribed()
+            while self._running():
+                message = pubsub.get_message(timeout=1)
+                if message and message["type"] == "message":
+                    self._notify()
+        finally:
+            pubsub.close()
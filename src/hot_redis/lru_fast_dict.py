@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from hot_redis.fast_dict import DelayButFastDict, K, V
+
+
+# cached answer for a field that does not exist
+MISSING = object()
+# the field is not in the LRU
+_NOT_CACHED = object()
+
+
+class LRUDelayButFastDict(DelayButFastDict[K, V]):
+    """
+    DelayButFastDict for hashes too big to copy in every process: fields are
+    read with HGET/HMGET on miss and kept in a bounded LRU, missing fields
+    included. A move of the version empties the LRU, or with a changelog
+    only drops the written fields, the hash itself is never read whole.
+    usage:
+
+        PROFILES = LRUDelayButFastDict(Redis(decode_responses=True), key="PROFILES", maxsize=10000, ttl=60)
+        PROFILES["123"]  # HGET on the first read, from memory afterwards
+        PROFILES.get_many(["123", "456"])  # one HMGET for the fields not cached
+
+    len(), iteration, keys(), values() and items() read redis (HLEN/HSCAN) every time.
+    """
+
+    def __init__(self, redis_client=None, key="", timeout=10, maxsize: int = 10000, ttl: float = 60,
+                 **kwargs):
+        """
+        params:
+            maxsize: how many fields the LRU keeps
+            ttl: seconds a field stays cached, even if the version did not move
+            other params are the ones of DelayButFastDict, except shared_path,
+                scan_count, conditional_fetch, snapshot_path and snapshot_blob which
+                read the whole hash
+        """
+        for option in ("shared_path", "scan_count", "conditional_fetch", "snapshot_path", "snapshot_blob"):
+            if kwargs.get(option):
+                raise ValueError(f"{option} can't be used with LRUDelayButFastDict")
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        # increased when cached fields are dropped, a read started before
+        # must not store what it read
+        self._generation = 0
+        self._value: "OrderedDict[str, Tuple[Any, float]]"
+        super().__init__(redis_client, key=key, timeout=timeout, **kwargs)
+
+    def on_change(self, callback):
+        raise ValueError("LRUDelayButFastDict can't report changes, it never holds the whole hash")
+
+    def _empty(self) -> "OrderedDict[str, Tuple[Any, float]]":
+        return OrderedDict()
+
+    def _store(self, value: "OrderedDict[str, Tuple[Any, float]]", field: str, item: Any) -> None:
+        value[field] = (item, time.monotonic() + self.ttl)
+        value.move_to_end(field)
+        while len(value) > self.maxsize:
+            value.popitem(last=False)
+
+    def _apply_op(self, value: "OrderedDict[str, Tuple[Any, float]]", op: list) -> None:
+        # only our own writes, the written fields are likely read again
+        if op[0] == "hset":
+            for field, item in zip(op[1::2], op[2::2]):
+                self._store(value, field, self.codec.decode(item))
+        elif op[0] == "hdel":
+            for field in op[1:]:
+                self._store(value, field, MISSING)
+        elif op[0] == "del":
+            value.clear()
+
+    def update_local(self, ops: List[list]) -> None:
+        with self._lock:
+            # a read in flight may hold the value before our write
+            self._generation += 1
+            super().update_local(ops)
+
+    def refresh(self) -> None:
+        self._reset(int(self.redis_client.get(self.version_key) or 0))
+
+    def _reset(self, version: int) -> None:
+        started = time.perf_counter()
+        with self._swap_lock, self._lock:
+            self._generation += 1
+            self._swap(version, self._empty())
+        self.metrics.observe_refresh(time.perf_counter() - started)
+
+    def _check_version(self) -> bool:
+        version = int(self.redis_client.get(self.version_key) or 0)
+        if version == self.version:
+            return False
+        changes = self.changelog.read(self.version, version) if self.changelog else None
+        if changes is None:
+            self._reset(version)
+        else:
+            self.apply_changes(version, changes)
+        return True
+
+    def apply_changes(self, version: int, changes: List[List[list]]) -> None:
+        started = time.perf_counter()
+        with self._swap_lock, self._lock:
+            self._generation += 1
+            for ops in changes:
+                for op in ops:
+                    if op[0] == "del":
+                        self._value.clear()
+                    else:
+                        fields = op[1::2] if op[0] == "hset" else op[1:]
+                        for field in fields:
+                            self._value.pop(field, None)
+            self.version = version
+        self.metrics.observe_refresh(time.perf_counter() - started, delta=True)
+
+    def queue_refresh(self, pipeline, version: int) -> int:
+        return 0
+
+    def _cached(self, field: str) -> Any:
+        """
+        the cached value of `field`, _NOT_CACHED if it is not cached
+        """
+        with self._lock:
+            entry = self._value.get(field)
+            if entry is None:
+                return _NOT_CACHED
+            if entry[1] <= time.monotonic():
+                del self._value[field]
+                return _NOT_CACHED
+            self._value.move_to_end(field)
+            return entry[0]
+
+    def _fetch_fields(self, fields: List[str]) -> List[Any]:
+        generation = self._generation
+        items = self.redis_client.hmget(self.value_key, fields)
+        values = [MISSING if item is None else self.codec.decode(item) for item in items]
+        with self._lock:
+            if generation == self._generation:
+                for field, value in zip(fields, values):
+                    self._store(self._value, field, value)
+        return values
+
+    def _lookup(self, key: K) -> Any:
+        self.refresh_in_need()
+        field = str(key)
+        value = self._cached(field)
+        if value is _NOT_CACHED:
+            value = self._fetch_fields([field])[0]
+        return value
+
+    def __contains__(self, key: K) -> bool:
+        return self._lookup(key) is not MISSING
+
+    def __getitem__(self, key: K) -> V:
+        value = self._lookup(key)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        value = self._lookup(key)
+        if value is MISSING:
+            return default
+        return value
+
+    def get_many(self, keys: Iterable[K]) -> Dict[str, V]:
+        """
+        the existing fields among `keys`, with one HMGET for the ones not cached
+        """
+        self.refresh_in_need()
+        found: Dict[str, V] = {}
+        misses: List[str] = []
+        for key in keys:
+            field = str(key)
+            value = self._cached(field)
+            if value is _NOT_CACHED:
+                misses.append(field)
+            elif value is not MISSING:
+                found[field] = value
+        if misses:
+            for field, value in zip(misses, self._fetch_fields(misses)):
+                if value is not MISSING:
+                    found[field] = value
+        return found
+
+    def keys(self) -> Iterator[str]:  # type: ignore[override]
+        return (field for field, _ in self.redis_client.hscan_iter(self.value_key))
+
+    def values(self) -> Iterator[V]:  # type: ignore[override]
+        return (value for _, value in self.items())
+
+    def items(self) -> Iterator[Tuple[str, V]]:  # type: ignore[override]
+        decode = self.codec.decode
+        return (
+            (field, decode(item))
+            for field, item in self.redis_client.hscan_iter(self.value_key)
+        )
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return self.redis_client.hlen(self.value_key)
+
+    def __str__(self):
+        return f"LRUDelayButFastDict:{self.value_key}:{self.version_key}: {len(self._value)} cached fields"
+
+    __repr__ = __str__
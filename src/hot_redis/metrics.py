@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import bisect
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    from hot_redis.fast_cache import FastCache
+
+
+class CacheMetrics:
+    """
+    counters of one fast cache, only updated on the refresh path so reads stay free
+    """
+
+    # upper bounds of the refresh duration histogram, in seconds
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+    def __init__(self):
+        self.version_checks = 0
+        self.refreshes = 0
+        self.delta_refreshes = 0
+        self.refresh_seconds = 0.0
+        self.refresh_buckets: List[int] = [0] * len(self.BUCKETS)
+        self.payload_entries = 0
+        self.payload_bytes = 0
+        # time.monotonic() of the last snapshot swap
+        self.swapped_at: Optional[float] = None
+
+    def observe_refresh(self, seconds: float, delta: bool = False) -> None:
+        if delta:
+            self.delta_refreshes += 1
+        else:
+            self.refreshes += 1
+        self.refresh_seconds += seconds
+        self.refresh_buckets[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+
+    def observe_payload(self, entries: int, size: int) -> None:
+        self.payload_entries = entries
+        self.payload_bytes = size
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+
+
+def prometheus_text(caches: Iterable["FastCache"]) -> str:
+    """
+    render the stats() of the caches in the prometheus text exposition format,
+    labeled by the value key of every cache
+    usage:
+
+        def metrics_view(request):
+            return HttpResponse(prometheus_text([USER_CACHE, WATCHING_USERS]), content_type="text/plain")
+    """
+    samples: Dict[str, List[str]] = {}
+    types: Dict[str, str] = {}
+
+    def add(family: str, kind: str, labels: str, value: Any, suffix: str = "") -> None:
+        types.setdefault(family, kind)
+        samples.setdefault(family, []).append(f"hot_redis_cache_{family}{suffix}{{{labels}}} {value}")
+
+    for cache in caches:
+        stats = cache.stats()
+        labels = _labels(cache=cache.value_key)
+        add("version_checks_total", "counter", labels, stats["version_checks"])
+        add("refreshes_total", "counter", f"{labels},{_labels(kind='full')}", stats["refreshes"])
+        add("refreshes_total", "counter", f"{labels},{_labels(kind='delta')}", stats["delta_refreshes"])
+        histogram = stats["refresh_seconds"]
+        cumulative = 0
+        for bound, count in zip(CacheMetrics.BUCKETS, histogram["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            add("refresh_seconds", "histogram", f"{labels},{_labels(le=le)}", cumulative, "_bucket")
+        add("refresh_seconds", "histogram", labels, histogram["sum"], "_sum")
+        add("refresh_seconds", "histogram", labels, histogram["count"], "_count")
+        add("payload_entries", "gauge", labels, stats["payload_entries"])
+        add("payload_bytes", "gauge", labels, stats["payload_bytes"])
+        add("entries", "gauge", labels, stats["entries"])
+        add("memory_bytes", "gauge", labels, stats["memory_bytes"])
+        if stats["snapshot_age"] is not None:
+            add("snapshot_age_seconds", "gauge", labels, stats["snapshot_age"])
+        add("version", "gauge", labels, stats["version"])
+
+    lines: List[str] = []
+    for name, kind in types.items():
+        lines.append(f"# TYPE hot_redis_cache_{name} {kind}")
+        lines.extend(samples[name])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import contextlib
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from typing import ItemsView, Iterator, Mapping, Optional, Tuple
+
+
+MAGIC = b"HRSNAP01"
+# magic, version, entry count, slot count
+HEADER = struct.Struct("<8sqQQ")
+SLOT = struct.Struct("<Q")
+# key length, value length
+ENTRY = struct.Struct("<II")
+
+
+def write_snapshot(path: str, version: int, items: Mapping[str, str]) -> None:
+    """
+    write the items into an mmap friendly file and atomically replace `path`
+
+    layout: header | slots | entries
+        slots: open addressing table (linear probing, crc32 of the key),
+            each slot holds the offset of an entry + 1, 0 means empty
+        entries: key length, value length, utf-8 key, utf-8 value
+    """
+    slot_count = 8
+    while slot_count < len(items) * 2:
+        slot_count *= 2
+    slots = [0] * slot_count
+    entries = bytearray()
+    entries_start = HEADER.size + SLOT.size * slot_count
+    for key, value in items.items():
+        key_bytes = key.encode()
+        value_bytes = value.encode()
+        slot = zlib.crc32(key_bytes) & (slot_count - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = entries_start + len(entries) + 1
+        entries += ENTRY.pack(len(key_bytes), len(value_bytes))
+        entries += key_bytes
+        entries += value_bytes
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, version, len(items), slot_count))
+        f.write(struct.pack(f"<{slot_count}Q", *slots))
+        f.write(entries)
+    os.replace(tmp_path, path)
+
+
+class SharedSnapshot(Mapping[str, str]):
+    """
+    read only mapping over a file written by `write_snapshot`, lookups
+    read the memory mapped file directly and share the page cache
+    with every other process of the host
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self._count, self._slot_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        self._entries_start = HEADER.size + SLOT.size * self._slot_count
+
+    def _find(self, key: str) -> Optional[Tuple[int, int]]:
+        key_bytes = key.encode()
+        mask = self._slot_count - 1
+        slot = zlib.crc32(key_bytes) & mask
+        while True:
+            offset = SLOT.unpack_from(self._mmap, HEADER.size + SLOT.size * slot)[0]
+            if not offset:
+                return None
+            offset -= 1
+            key_length, value_length = ENTRY.unpack_from(self._mmap, offset)
+            key_start = offset + ENTRY.size
+            if key_length == len(key_bytes) and self._mmap[key_start:key_start + key_length] == key_bytes:
+                return key_start + key_length, value_length
+            slot = (slot + 1) & mask
+
+    def __getitem__(self, key: str) -> str:
+        found = self._find(key)
+        if found is None:
+            raise KeyError(key)
+        start, length = found
+        return self._mmap[start:start + length].decode()
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) is not None
+
+    def _entries(self) -> Iterator[Tuple[str, str]]:
+        offset = self._entries_start
+        for _ in range(self._count):
+            key_length, value_length = ENTRY.unpack_from(self._mmap, offset)
+            key_start = offset + ENTRY.size
+            value_start = key_start + key_length
+            yield (
+                self._mmap[key_start:value_start].decode(),
+                self._mmap[value_start:value_start + value_length].decode(),
+            )
+            offset = value_start + value_length
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key, _ in self._entries())
+
+    def items(self):  # type: ignore[override]
+        return _SnapshotItems(self)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """
+        size of the mapped file, shared with the other processes
+        """
+        return len(self._mmap)
+
+    def __repr__(self) -> str:
+        return repr(dict(self._entries()))
+
+
+class _SnapshotItems(ItemsView):
+    """
+    iterate the entries in file order instead of looking up every key
+    """
+
+    _mapping: SharedSnapshot
+
+    def __iter__(self):
+        return self._mapping._entries()
+
+
+class SharedSnapshotStore:
+    """
+    a snapshot file shared by every process of a host, e.g. the workers of a
+    prefork server. `path.lock` elects the process that talks to redis: at most
+    one process checks the version every `interval` seconds and publishes a new
+    file when it moved, the others only remap the file when it was replaced.
+    """
+
+    def __init__(self, path: str):
+        import fcntl  # posix only
+        self._fcntl = fcntl
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        created = not os.path.exists(self.lock_path)
+        self._lock_file = open(self.lock_path, "a+")
+        if created:
+            self.expire()
+        self._stat: Optional[Tuple[int, int]] = None
+        self.snapshot: Optional[SharedSnapshot] = None
+
+    def load(self) -> Optional[SharedSnapshot]:
+        """
+        return the latest published snapshot, remapping the file only if it was replaced
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        if (stat.st_ino, stat.st_mtime_ns) != self._stat:
+            self.snapshot = SharedSnapshot(self.path)
+            self._stat = (stat.st_ino, stat.st_mtime_ns)
+        return self.snapshot
+
+    @contextlib.contextmanager
+    def due(self, interval: float):
+        """
+        yield True if this process holds the lock and nobody
+        checked redis during the last `interval` seconds
+        """
+        try:
+            self._fcntl.flock(self._lock_file, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            checked_at = os.stat(self.lock_path).st_mtime
+            if time.time() - checked_at < interval:
+                yield False
+            else:
+                yield True
+                os.utime(self.lock_path)
+        finally:
+            self._fcntl.flock(self._lock_file, self._fcntl.LOCK_UN)
+
+    def expire(self) -> None:
+        """
+        let the next process check redis without waiting for the interval
+        """
+        os.utime(self.lock_path, (0, 0))
+
+    def publish(self, version: int, items: Mapping[str, str]) -> None:
+        write_snapshot(self.path, version, items)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import asyncio
+import unittest
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from hot_redis.async_fast_dict import AsyncDelayButFastDict
+from hot_redis.fast_dict import DelayButFastDict
+
+
+class TestAsyncFastDict(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_async_dict}:value")
+        self.redis_client.delete("{test_async_dict}:version")
+        self.redis_client.delete("{test_async_dict}:changelog")
+
+    async def asyncSetUp(self):
+        self.async_client = AsyncRedis(decode_responses=True)
+
+    async def asyncTearDown(self):
+        await self.async_client.aclose()
+
+    def tearDown(self):
+        self.redis_client.delete("{test_async_dict}:value")
+        self.redis_client.delete("{test_async_dict}:version")
+        self.redis_client.delete("{test_async_dict}:changelog")
+
+    async def wait_for(self, condition, timeout=2.0):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not condition() and loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        return condition()
+
+    async def test_read_write(self):
+        cache: AsyncDelayButFastDict[str, str] = AsyncDelayButFastDict(
+            redis_client=self.async_client, key="test_async_dict", timeout=0)
+        await cache.set("a", "1")
+        await cache.update({"b": "2"}, c=3)
+        self.assertEqual(cache["a"], "1")
+        self.assertEqual(cache.get("c"), "3")
+        self.assertEqual(cache.get("missing", "default"), "default")
+        await cache.delete("a")
+        self.assertFalse("a" in cache)
+        await cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    async def test_refresh_in_task(self):
+        writer: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_async_dict", timeout=0)
+        writer["a"] = "1"
+        cache: AsyncDelayButFastDict[str, str] = AsyncDelayButFastDict(
+            redis_client=self.async_client, key="test_async_dict", timeout=0.01)
+        # the first read doesn't wait for redis
+        self.assertFalse("a" in cache)
+        self.assertTrue(await self.wait_for(lambda: cache.get("a") == "1"))
+        writer["a"] = "2"
+        self.assertTrue(await self.wait_for(lambda: cache.get("a") == "2"))
+
+    async def test_startup_init(self):
+        self.redis_client.hset("{test_async_dict}:value", "a", "1")
+        self.redis_client.incr("{test_async_dict}:version")
+        cache: AsyncDelayButFastDict[str, str] = AsyncDelayButFastDict(
+            redis_client=self.async_client, key="test_async_dict", timeout=10, startup_init=True)
+        await cache._task
+        self.assertEqual(cache["a"], "1")
+
+    async def test_changelog(self):
+        writer: AsyncDelayButFastDict[str, str] = AsyncDelayButFastDict(
+            redis_client=self.async_client, key="test_async_dict", timeout=0, changelog_size=10)
+        reader: AsyncDelayButFastDict[str, str] = AsyncDelayButFastDict(
+            redis_client=self.async_client, key="test_async_dict", timeout=0, changelog_size=10)
+        await writer.set("a", "1")
+        await reader.refresh()
+
+        async def fail():
+            raise AssertionError("full refresh is not expected")
+        reader.refresh = fail  # type: ignore
+        await writer.set("b", "2")
+        await writer.delete("a")
+        await reader.check_version()
+        self.assertEqual(dict(reader.items()), {"b": "2"})
+
+    async def test_refresh_during_own_write(self):
+        cache = AsyncDelayButFastDict(redis_client=self.async_client, key="test_async_dict", timeout=10)
+        await cache.refresh()
+        write = cache.write
+
+        async def racing_write(ops):
+            version = await write(ops)
+            # another process deletes the field and we load its snapshot first
+            self.redis_client.hdel("{test_async_dict}:value", "a")
+            self.redis_client.incr("{test_async_dict}:version")
+            await cache.refresh()
+            return version
+        cache.write = racing_write  # type: ignore
+        await cache.set("a", "1")
+        self.assertEqual(cache.version, 2)
+        self.assertFalse("a" in cache)
+
+    async def test_codec(self):
+        cache = AsyncDelayButFastDict(
+            redis_client=self.async_client, key="test_async_dict", timeout=10, codec="json")
+        await cache.set("a", [1, 2])
+        self.assertEqual(cache["a"], [1, 2])
+        other = AsyncDelayButFastDict(
+            redis_client=self.async_client, key="test_async_dict", timeout=10, codec="json")
+        await other.refresh()
+        self.assertEqual(other["a"], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import asyncio
+import unittest
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from hot_redis.async_fast_set import AsyncDelayButFastSet
+from hot_redis.fast_set import DelayButFastSet
+
+
+class TestAsyncFastSet(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_async_set}:value")
+        self.redis_client.delete("{test_async_set}:version")
+
+    async def asyncSetUp(self):
+        self.async_client = AsyncRedis(decode_responses=True)
+
+    async def asyncTearDown(self):
+        await self.async_client.aclose()
+
+    def tearDown(self):
+        self.redis_client.delete("{test_async_set}:value")
+        self.redis_client.delete("{test_async_set}:version")
+
+    async def test_shared_with_sync_set(self):
+        writer: DelayButFastSet[int] = DelayButFastSet(
+            redis_client=self.redis_client, key="test_async_set", timeout=0, version="v2")
+        writer.update(1, 2)
+        cache: AsyncDelayButFastSet[int] = AsyncDelayButFastSet(
+            redis_client=self.async_client, key="test_async_set", timeout=0.01)
+        await cache.refresh()
+        self.assertTrue(1 in cache)
+        await cache.add(3)
+        await cache.discard(1)
+        self.assertEqual(set(cache), {"2", "3"})
+        self.assertEqual(set(writer), {"2", "3"})
+        writer.add(4)
+        await asyncio.sleep(0.02)
+        _ = 4 in cache  # schedules the refresh
+        await cache._task
+        self.assertTrue(4 in cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+from redis import Redis
+
+from hot_redis.bucketed_fast_dict import BucketedDelayButFastDict
+
+
+KEYS = [f"{{test_bucketed:{index}}}:{suffix}" for index in range(4) for suffix in ("value", "version")]
+
+
+class TestBucketedFastDict(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete(*KEYS)
+
+    def tearDown(self):
+        self.redis_client.delete(*KEYS)
+
+    def create(self) -> BucketedDelayButFastDict[str, str]:
+        return BucketedDelayButFastDict(
+            redis_client=self.redis_client, key="test_bucketed", buckets=4, timeout=0)
+
+    def test_read_write(self):
+        writer = self.create()
+        writer.update({f"key_{i}": str(i) for i in range(100)})
+        writer["extra"] = "1"
+        del writer["key_0"]
+        reader = self.create()
+        self.assertEqual(len(reader), 100)
+        self.assertEqual(reader["key_99"], "99")
+        self.assertFalse("key_0" in reader)
+        self.assertEqual(reader.get("key_0", "missing"), "missing")
+        self.assertEqual(dict(reader.items()), dict(writer.items()))
+        self.assertEqual(sorted(reader), sorted(writer.keys()))
+        # one version increase per bucket for the bulk write
+        self.assertEqual(
+            sum(int(self.redis_client.get(f"{{test_bucketed:{index}}}:version")) for index in range(4)),
+            4 + 2,
+        )
+        writer.delete_many(f"key_{i}" for i in range(100))
+        writer.clear()
+        self.assertEqual(len(reader), 0)
+
+    def test_index(self):
+        writer = self.create()
+        writer.update({f"key_{i}": str(i % 3) for i in range(30)})
+        reader = self.create()
+        reader.add_index("value")
+        self.assertEqual(reader.lookup("value", "0"), {f"key_{i}" for i in range(0, 30, 3)})
+        writer["key_0"] = "1"
+        self.assertEqual(len(reader.lookup("value", "0")), 9)
+        self.assertIn("key_0", reader.lookup("value", "1"))
+
+    def test_only_changed_bucket_is_reloaded(self):
+        writer = self.create()
+        writer.update({f"key_{i}": str(i) for i in range(100)})
+        reader = self.create()
+        self.assertEqual(len(reader), 100)
+        snapshots = [bucket._value for bucket in reader.buckets]
+        writer["key_1"] = "changed"
+        self.assertEqual(reader["key_1"], "changed")
+        changed = [
+            index for index, bucket in enumerate(reader.buckets)
+            if bucket._value is not snapshots[index]
+        ]
+        self.assertEqual(changed, [reader.buckets.index(reader.bucket("key_1"))])
+
+    def test_invalid_params(self):
+        with self.assertRaises(ValueError):
+            BucketedDelayButFastDict(redis_client=self.redis_client, key="test_bucketed", buckets=0)
+        with self.assertRaises(ValueError):
+            BucketedDelayButFastDict(redis_client=self.redis_client, key="")
+
+
+if __name__ == "__main__":
+    unittest.main()
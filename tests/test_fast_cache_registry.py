@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+from redis import Redis
+
+from hot_redis.fast_cache_registry import FastCacheRegistry
+from hot_redis.fast_dict import DelayButFastDict
+from hot_redis.fast_set import DelayButFastSet
+
+
+KEYS = [
+    "{test_registry_dict}:value", "{test_registry_dict}:version",
+    "{test_registry_log}:value", "{test_registry_log}:version", "{test_registry_log}:changelog",
+    "{test_registry_set}:value", "{test_registry_set}:version",
+]
+
+
+class CountingRedis(Redis):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pipelines = 0
+        self.commands = 0
+
+    def pipeline(self, *args, **kwargs):
+        self.pipelines += 1
+        return super().pipeline(*args, **kwargs)
+
+    def execute_command(self, *args, **kwargs):
+        self.commands += 1
+        return super().execute_command(*args, **kwargs)
+
+
+class TestFastCacheRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete(*KEYS)
+
+    def tearDown(self):
+        self.redis_client.delete(*KEYS)
+
+    def create(self, redis_client, registry):
+        return (
+            DelayButFastDict(redis_client=redis_client, key="test_registry_dict", registry=registry),
+            DelayButFastDict(redis_client=redis_client, key="test_registry_log", changelog_size=10,
+                             registry=registry),
+            DelayButFastSet(redis_client=redis_client, key="test_registry_set", version="v2",
+                            registry=registry),
+        )
+
+    def test_one_pipeline_per_step(self):
+        writer_dict, writer_log, writer_set = self.create(self.redis_client, None)
+        writer_dict["a"] = "1"
+        writer_log["b"] = "2"
+        writer_set.add("c")
+
+        counting = CountingRedis(decode_responses=True)
+        registry = FastCacheRegistry(timeout=0)
+        reader_dict, reader_log, reader_set = self.create(counting, registry)
+        self.assertEqual(reader_dict["a"], "1")
+        # one pipeline for the versions, one for the refreshes
+        self.assertEqual((counting.pipelines, counting.commands), (2, 0))
+        self.assertEqual(reader_log["b"], "2")
+        self.assertTrue("c" in reader_set)
+
+        counting.pipelines = 0
+        writer_log["b"] = "3"
+        writer_set.add("d")
+        self.assertEqual(reader_log["b"], "3")
+        self.assertEqual((counting.pipelines, counting.commands), (2, 0))
+        self.assertTrue("d" in reader_set)
+
+        counting.pipelines = 0
+        self.assertEqual(reader_dict["a"], "1")
+        # nothing changed, only the version check
+        self.assertEqual((counting.pipelines, counting.commands), (1, 0))
+
+    def test_registry_timeout(self):
+        registry = FastCacheRegistry(timeout=3600)
+        reader_dict, _, _ = self.create(self.redis_client, registry)
+        self.assertFalse("a" in reader_dict)
+        self.redis_client.hset("{test_registry_dict}:value", "a", "1")
+        self.redis_client.incr("{test_registry_dict}:version")
+        self.assertFalse("a" in reader_dict)
+        reader_dict.invalidate()
+        self.assertTrue("a" in reader_dict)
+
+
+if __name__ == "__main__":
+    unittest.main()
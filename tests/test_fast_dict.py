@@ -509,5 +509,670 @@ class TestFastDictGeneric(unittest.TestCase):
         self.assertEqual(test_dict["key3"], "value3")
 
 
+class TestFastDictChangelog(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_changelog}:value")
+        self.redis_client.delete("{test_changelog}:version")
+        self.redis_client.delete("{test_changelog}:changelog")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_changelog}:value")
+        self.redis_client.delete("{test_changelog}:version")
+        self.redis_client.delete("{test_changelog}:changelog")
+
+    def create(self, changelog_size=10) -> DelayButFastDict[str, str]:
+        return DelayButFastDict(
+            redis_client=self.redis_client,
+            key="test_changelog",
+            timeout=0,
+            changelog_size=changelog_size,
+        )
+
+    def test_apply_changes_without_full_refresh(self):
+        writer = self.create()
+        reader = self.create()
+        writer["a"] = "1"
+        writer["b"] = "2"
+        self.assertEqual(dict(reader.items()), {"a": "1", "b": "2"})
+
+        def fail():
+            raise AssertionError("full refresh is not expected")
+        reader.refresh = fail  # type: ignore
+        writer["a"] = "3"
+        del writer["b"]
+        writer["c"] = "4"
+        self.assertEqual(dict(reader.items()), {"a": "3", "c": "4"})
+        writer.clear()
+        writer["d"] = "5"
+        self.assertEqual(dict(reader.items()), {"d": "5"})
+        self.assertEqual(reader.version, int(self.redis_client.get("{test_changelog}:version")))
+
+    def test_trimmed_changelog_falls_back_to_full_refresh(self):
+        writer = self.create(changelog_size=2)
+        reader = self.create(changelog_size=2)
+        writer["a"] = "1"
+        self.assertEqual(reader["a"], "1")
+        for i in range(5):
+            writer[f"key_{i}"] = str(i)
+        self.assertEqual(self.redis_client.llen("{test_changelog}:changelog"), 2)
+        self.assertEqual(len(reader), 6)
+
+    def test_write_without_changelog_falls_back_to_full_refresh(self):
+        writer = self.create()
+        reader = self.create()
+        writer["a"] = "1"
+        self.assertEqual(reader["a"], "1")
+        self.redis_client.hset("{test_changelog}:value", "b", "2")
+        self.redis_client.incr("{test_changelog}:version")
+        writer["c"] = "3"
+        self.assertEqual(dict(reader.items()), {"a": "1", "b": "2", "c": "3"})
+
+
+class TestFastDictOnChange(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_on_change}:value")
+        self.redis_client.delete("{test_on_change}:version")
+        self.redis_client.delete("{test_on_change}:changelog")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_on_change}:value")
+        self.redis_client.delete("{test_on_change}:version")
+        self.redis_client.delete("{test_on_change}:changelog")
+
+    def create(self, **kwargs) -> DelayButFastDict[str, str]:
+        return DelayButFastDict(
+            redis_client=self.redis_client,
+            key="test_on_change",
+            timeout=0,
+            changelog_size=10,
+            **kwargs,
+        )
+
+    def test_on_change(self):
+        writer = self.create()
+        reader = self.create()
+        writer.update({"a": "1", "b": "2"})
+        self.assertEqual(len(reader), 2)
+        changes = []
+        reader.on_change(changes.append)
+        reader.on_change(changes.append)
+        writer["a"] = "3"
+        del writer["b"]
+        writer["c"] = "4"
+        writer["c"] = "4"
+        self.assertEqual(len(reader), 2)
+        self.assertEqual(len(changes), 2)
+        self.assertIs(changes[0], changes[1])
+        self.assertEqual(changes[0].added, {"c": "4"})
+        self.assertEqual(changes[0].removed, {"b": "2"})
+        self.assertEqual(changes[0].changed, {"a": ("1", "3")})
+
+        # full refresh without a changelog entry, and our own writes
+        changes.clear()
+        reader.remove_on_change(changes.append)
+        self.redis_client.hset("{test_on_change}:value", "d", "5")
+        self.redis_client.incr("{test_on_change}:version")
+        self.assertEqual(len(reader), 3)
+        reader["a"] = "6"
+        reader.clear()
+        self.assertEqual(changes[0].added, {"d": "5"})
+        self.assertEqual(changes[1].changed, {"a": ("3", "6")})
+        self.assertEqual(changes[2].removed, {"a": "6", "c": "4", "d": "5"})
+        self.assertEqual(len(changes), 3)
+
+    def test_callback_reads_the_cache(self):
+        writer = self.create()
+        cache = self.create()
+        sizes = []
+        cache.on_change(lambda change: sizes.append(len(cache)))
+        cache.on_change(lambda change: cache.fresh(0))
+        thread = threading.Thread(target=cache.__setitem__, args=("a", "1"))
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        writer["b"] = "2"
+        self.assertEqual(cache.fresh(0)["b"], "2")
+        self.assertEqual(sizes, [1, 2])
+
+    def test_callbacks_in_order(self):
+        cache = self.create(write_behind=3600)
+        changes = []
+
+        @cache.on_change
+        def write_again(change):
+            changes.append(change)
+            if "a" in change.added:
+                cache["b"] = "2"
+        cache["a"] = "1"
+        self.assertEqual([change.added for change in changes], [{"a": "1"}, {"b": "2"}])
+        cache.close()
+
+
+class TestFastDictInvalidation(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_invalidation}:value")
+        self.redis_client.delete("{test_invalidation}:version")
+        self.notify_config = self.redis_client.config_get("notify-keyspace-events")["notify-keyspace-events"]
+
+    def tearDown(self):
+        self.redis_client.config_set("notify-keyspace-events", self.notify_config)
+        self.redis_client.delete("{test_invalidation}:value")
+        self.redis_client.delete("{test_invalidation}:version")
+
+    def wait_for(self, condition, timeout=2.0):
+        deadline = time.perf_counter() + timeout
+        while not condition() and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def check_invalidation(self, mode):
+        writer: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_invalidation", timeout=3600)
+        reader: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_invalidation", timeout=3600,
+            invalidation=mode)
+        self.assertTrue(reader.watcher.ready.wait(2))
+        writer["a"] = "1"
+        self.assertTrue(self.wait_for(lambda: reader.get("a") == "1"))
+        writer["a"] = "2"
+        self.assertTrue(self.wait_for(lambda: reader.get("a") == "2"))
+        # nothing changed, the long timeout keeps reads local
+        self.assertGreater(reader.expire_at, time.perf_counter())
+        reader.close()
+        self.assertFalse(reader.watcher._thread.is_alive())
+
+    def test_tracking(self):
+        self.check_invalidation("tracking")
+
+    def test_keyspace(self):
+        self.redis_client.config_set("notify-keyspace-events", "K$")
+        self.check_invalidation("keyspace")
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            DelayButFastDict(redis_client=self.redis_client, key="test_invalidation", invalidation="polling")
+
+
+class TestFastDictBackgroundRefresh(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_background}:value")
+        self.redis_client.delete("{test_background}:version")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_background}:value")
+        self.redis_client.delete("{test_background}:version")
+
+    def test_refresh_on_background_thread(self):
+        writer: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_background", timeout=0.05)
+        writer["a"] = "1"
+        reader: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_background", timeout=0.05,
+            background_refresh=True)
+        self.assertEqual(reader["a"], "1")
+
+        checked_by = []
+        check_version = reader.check_version
+
+        def record():
+            checked_by.append(threading.current_thread())
+            check_version()
+        reader.check_version = record  # type: ignore
+        writer["a"] = "2"
+        deadline = time.perf_counter() + 2
+        while reader["a"] != "2" and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(reader["a"], "2")
+        self.assertTrue(checked_by)
+        self.assertNotIn(threading.main_thread(), checked_by)
+        reader.close()
+        self.assertFalse(reader.refresher.is_alive())
+
+    def test_keep_snapshot_when_redis_fails(self):
+        reader: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_background", timeout=0.01,
+            background_refresh=True)
+        reader["a"] = "1"
+        self.assertEqual(reader["a"], "1")
+
+        def fail():
+            raise ConnectionError("redis is down")
+        reader.check_version = fail  # type: ignore
+        time.sleep(0.05)
+        self.assertEqual(reader["a"], "1")
+        self.assertTrue(reader.refresher.is_alive())
+        reader.close()
+
+
+class TestFastDictBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_bulk}:value")
+        self.redis_client.delete("{test_bulk}:version")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_bulk}:value")
+        self.redis_client.delete("{test_bulk}:version")
+
+    def test_one_version_per_bulk_write(self):
+        cache: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_bulk", timeout=0)
+        cache.update({f"key_{i}": str(i) for i in range(2500)}, extra="1")
+        self.assertEqual(self.redis_client.get("{test_bulk}:version"), "1")
+        self.assertEqual(self.redis_client.hlen("{test_bulk}:value"), 2501)
+        self.assertEqual(len(cache), 2501)
+        cache.update([("key_0", "zero")])
+        self.assertEqual(cache["key_0"], "zero")
+        cache.delete_many(f"key_{i}" for i in range(1, 2500))
+        self.assertEqual(self.redis_client.get("{test_bulk}:version"), "3")
+        self.assertEqual(dict(cache.items()), {"key_0": "zero", "extra": "1"})
+        cache.set_many({})
+        cache.delete_many([])
+        self.assertEqual(self.redis_client.get("{test_bulk}:version"), "3")
+
+    def test_own_writes_do_not_reload(self):
+        cache: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_bulk", timeout=0)
+        self.assertEqual(len(cache), 0)
+
+        def fail():
+            raise AssertionError("reload is not expected")
+        refresh = cache.refresh
+        cache.refresh = fail  # type: ignore
+        cache["a"] = "1"
+        cache.update({"b": "2", "c": "3"})
+        del cache["c"]
+        self.assertEqual(dict(cache.items()), {"a": "1", "b": "2"})
+        self.assertEqual(cache.version, 3)
+        # another writer: reload once
+        self.redis_client.hset("{test_bulk}:value", "d", "4")
+        self.redis_client.incr("{test_bulk}:version")
+        cache["e"] = "5"
+        self.assertEqual(cache.version, 3)
+        cache.refresh = refresh  # type: ignore
+        self.assertEqual(dict(cache.items()), {"a": "1", "b": "2", "d": "4", "e": "5"})
+        self.assertEqual(cache.version, 5)
+
+    def _race_refresh(self, cache: DelayButFastDict, write_behind_write) -> None:
+        """
+        run a refresh that reads redis before `write_behind_write`
+        writes and swaps its snapshot in right after the write
+        """
+        loaded = threading.Event()
+        resume = threading.Event()
+        load = cache._load
+
+        def paused_load():
+            result = load()
+            loaded.set()
+            resume.wait(5)
+            return result
+        cache._load = paused_load  # type: ignore
+        refresher = threading.Thread(target=cache.check_version)
+        refresher.start()
+        loaded.wait(5)
+        cache._load = load  # type: ignore
+        write = cache.write
+
+        def racing_write(ops):
+            version = write(ops)
+            resume.set()
+            refresher.join()
+            return version
+        cache.write = racing_write  # type: ignore
+        write_behind_write()
+        cache.write = write  # type: ignore
+
+    def test_refresh_racing_own_write(self):
+        self.redis_client.hset("{test_bulk}:value", mapping={"x": "1", "y": "2"})
+        self.redis_client.set("{test_bulk}:version", 2)
+        cache: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_bulk", timeout=3600)
+        self.assertEqual(len(cache), 2)
+        self.redis_client.incr("{test_bulk}:version")
+
+        def submit():
+            cache["z"] = "3"
+        self._race_refresh(cache, submit)
+        self.assertEqual(dict(cache.items()), {"x": "1", "y": "2", "z": "3"})
+        # the swapped snapshot was read before the write, the next check reloads
+        self.assertEqual(cache.version, 3)
+        cache.check_version()
+        self.assertEqual(cache.version, 4)
+        self.assertEqual(dict(cache.items()), {"x": "1", "y": "2", "z": "3"})
+
+    def test_refresh_racing_flush(self):
+        self.redis_client.hset("{test_bulk}:value", mapping={"x": "1", "y": "2"})
+        self.redis_client.set("{test_bulk}:version", 2)
+        cache: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_bulk", timeout=3600, write_behind=3600)
+        self.assertEqual(len(cache), 2)
+        self.redis_client.incr("{test_bulk}:version")
+        cache["z"] = "3"
+        self._race_refresh(cache, cache.flush)
+        self.assertEqual(dict(cache.items()), {"x": "1", "y": "2", "z": "3"})
+        self.assertEqual(cache.version, 4)
+        cache.close()
+
+
+class TestFastDictAdaptiveTimeout(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_adaptive}:value", "{test_adaptive}:version")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_adaptive}:value", "{test_adaptive}:version")
+
+    def test_back_off_and_tighten(self):
+        cache: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_adaptive", timeout=1, min_timeout=1, max_timeout=8)
+        self.assertEqual(len(cache), 0)
+        # the first load counts as a change
+        self.assertEqual(cache.timeout, 1)
+        cache.check_version()
+        self.assertEqual(cache.timeout, 2)
+        for _ in range(5):
+            cache.check_version()
+        self.assertEqual(cache.timeout, 8)
+        delay = cache.expire_at - time.perf_counter()
+        self.assertTrue(8 * 0.8 - 0.1 < delay <= 8 * 1.2, delay)
+        self.redis_client.hset("{test_adaptive}:value", "a", "1")
+        self.redis_client.incr("{test_adaptive}:version")
+        cache.check_version()
+        self.assertEqual(cache.timeout, 1)
+        self.assertEqual(cache["a"], "1")
+
+    def test_invalid_params(self):
+        for min_timeout, max_timeout in ((1, 0), (0, 1), (2, 1), (-1, 1)):
+            with self.assertRaises(ValueError):
+                DelayButFastDict(
+                    redis_client=self.redis_client, key="test_adaptive",
+                    min_timeout=min_timeout, max_timeout=max_timeout)
+
+
+class TestFastDictFresh(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_fresh}:value", "{test_fresh}:version")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_fresh}:value", "{test_fresh}:version")
+
+    def test_fresh(self):
+        cache: DelayButFastDict[str, str] = DelayButFastDict(
+            redis_client=self.redis_client, key="test_fresh", timeout=3600)
+        self.assertIsNone(cache.get("a"))
+        self.redis_client.hset("{test_fresh}:value", "a", "1")
+        self.redis_client.incr("{test_fresh}:version")
+        self.assertIsNone(cache.fresh(60).get("a"))
+        self.assertIsNone(cache.get("a"))
+        time.sleep(0.02)
+        self.assertEqual(cache.fresh(0.01).get("a"), "1")
+        self.assertTrue("a" in cache.fresh(0))
+
+
+class TestFastDictCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_codec}:value")
+        self.redis_client.delete("{test_codec}:version")
+        self.redis_client.delete("{test_codec}:changelog")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_codec}:value")
+        self.redis_client.delete("{test_codec}:version")
+        self.redis_client.delete("{test_codec}:changelog")
+
+    def test_json(self):
+        writer = DelayButFastDict(
+            redis_client=self.redis_client, key="test_codec", timeout=0, codec="json")
+        writer["a"] = {"rps": 10, "tags": ["x"]}
+        self.assertEqual(writer["a"], {"rps": 10, "tags": ["x"]})
+        self.assertEqual(self.redis_client.hget("{test_codec}:value", "a"), '{"rps":10,"tags":["x"]}')
+        reader = DelayButFastDict(
+            redis_client=self.redis_client, key="test_codec", timeout=10, codec="orjson")
+        self.assertEqual(reader["a"]["rps"], 10)
+        self.assertIs(reader["a"], reader["a"])
+
+    def test_int_with_changelog_and_scan(self):
+        writer = DelayButFastDict(
+            redis_client=self.redis_client, key="test_codec", timeout=0,
+            codec="int", changelog_size=10)
+        reader = DelayButFastDict(
+            redis_client=self.redis_client, key="test_codec", timeout=0,
+            codec="int", changelog_size=10, scan_count=10)
+        writer.update({"a": 1, "b": "2"})
+        self.assertEqual(dict(reader.items()), {"a": 1, "b": 2})
+        writer["c"] = 3
+        del writer["a"]
+        self.assertEqual(dict(reader.items()), {"b": 2, "c": 3})
+        self.assertEqual(writer.pop("b"), 2)
+
+    def test_invalid_codec(self):
+        with self.assertRaises(ValueError):
+            DelayButFastDict(redis_client=self.redis_client, key="test_codec", codec="pickle")
+        with self.assertRaises(ValueError):
+            DelayButFastDict(
+                redis_client=self.redis_client, key="test_codec", codec="json",
+                shared_path="/tmp/test_codec.snapshot")
+
+
+class TestFastDictIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_index}:value", "{test_index}:version", "{test_index}:changelog")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_index}:value", "{test_index}:version", "{test_index}:changelog")
+
+    def test_index(self):
+        writer = DelayButFastDict(
+            redis_client=self.redis_client, key="test_index", timeout=0,
+            codec="json", changelog_size=10)
+        reader = DelayButFastDict(
+            redis_client=self.redis_client, key="test_index", timeout=0,
+            codec="json", changelog_size=10)
+        writer.update({"a": {"team": "infra"}, "b": {"team": "web"}, "c": {}})
+        reader.add_index("team", lambda profile: profile.get("team"))
+        self.assertEqual(reader.lookup("team", "infra"), {"a"})
+        self.assertEqual(reader.lookup("team", "data"), frozenset())
+        with self.assertRaises(ValueError):
+            reader.add_index("team")
+        writer["c"] = {"team": "infra"}
+        writer["a"] = {"team": "web"}
+        self.assertEqual(reader.lookup("team", "infra"), {"c"})
+        self.assertEqual(reader.lookup("team", "web"), {"a", "b"})
+        reader.delete_many(["a", "c"])
+        self.assertEqual(reader.lookup("team", "web"), {"b"})
+        self.assertEqual(reader.lookup("team", "infra"), frozenset())
+        self.assertEqual(reader._indexes["team"][1], {"web": {"b"}})
+
+        codes = DelayButFastDict(redis_client=self.redis_client, key="test_index", timeout=0)
+        codes.add_index("value")
+        self.assertEqual(codes.lookup("value", '{"team":"web"}'), {"b"})
+
+
+class TestFastDictConditionalFetch(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_fetch}:value")
+        self.redis_client.delete("{test_fetch}:version")
+        self.redis_client.delete("{test_fetch}:changelog")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_fetch}:value")
+        self.redis_client.delete("{test_fetch}:version")
+        self.redis_client.delete("{test_fetch}:changelog")
+
+    def create(self, **kwargs) -> DelayButFastDict[str, str]:
+        return DelayButFastDict(
+            redis_client=self.redis_client, key="test_fetch", timeout=0,
+            conditional_fetch=True, **kwargs)
+
+    def test_one_round_trip(self):
+        writer = self.create()
+        reader = self.create()
+        commands = []
+        execute_command = self.redis_client.execute_command
+
+        def count(*args, **kwargs):
+            commands.append(args[0])
+            return execute_command(*args, **kwargs)
+        self.redis_client.execute_command = count  # type: ignore
+        self.assertEqual(len(reader), 0)
+        self.assertEqual(commands, ["EVALSHA"])
+        writer.update({"a": "1", "b": "2"})
+        commands.clear()
+        self.assertEqual(dict(reader.items()), {"a": "1", "b": "2"})
+        self.assertEqual(reader.version, 1)
+        self.assertEqual(commands, ["EVALSHA"])
+        commands.clear()
+        self.assertEqual(reader["a"], "1")
+        self.assertEqual(commands, ["EVALSHA"])
+
+    def test_changelog(self):
+        writer = self.create(changelog_size=2)
+        reader = self.create(changelog_size=2)
+        writer["a"] = "1"
+        self.assertEqual(dict(reader.items()), {"a": "1"})
+
+        def fail():
+            raise AssertionError("full refresh is not expected")
+        refresh = reader.refresh
+        reader.refresh = fail  # type: ignore
+        writer["b"] = "2"
+        del writer["a"]
+        self.assertEqual(dict(reader.items()), {"b": "2"})
+        reader.refresh = refresh  # type: ignore
+        for i in range(3):
+            writer[str(i)] = str(i)
+        # the changelog no longer covers the gap, the script returns the value
+        self.assertEqual(dict(reader.items()), {"b": "2", "0": "0", "1": "1", "2": "2"})
+        self.assertEqual(reader.version, 6)
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            self.create(scan_count=100)
+
+
+class TestFastDictSnapshotBlob(unittest.TestCase):
+
+    KEYS = ["{test_blob}:value", "{test_blob}:version", "{test_blob}:snapshot"]
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete(*self.KEYS)
+
+    def tearDown(self):
+        self.redis_client.delete(*self.KEYS)
+
+    def create(self) -> DelayButFastDict[str, str]:
+        return DelayButFastDict(
+            redis_client=self.redis_client, key="test_blob", timeout=0, snapshot_blob=True)
+
+    def test_readers_share_the_blob(self):
+        writer = self.create()
+        writer.update({f"key_{i}": "中文" * 10 for i in range(100)})
+        first = self.create()
+        self.assertEqual(len(first), 100)
+        blob = self.redis_client.get("{test_blob}:snapshot")
+        self.assertTrue(blob.startswith("1:"))
+        self.assertLess(len(blob), self.redis_client.memory_usage("{test_blob}:value"))
+
+        second = self.create()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("HGETALL is not expected")
+        second._queue_load = fail  # type: ignore
+        self.assertEqual(dict(second.items()), dict(first.items()))
+
+        writer["key_0"] = "changed"
+        second._queue_load = DelayButFastDict._queue_load.__get__(second)  # type: ignore
+        self.assertEqual(second["key_0"], "changed")
+        self.assertTrue(self.redis_client.get("{test_blob}:snapshot").startswith("2:"))
+
+    def test_publish_skips_moved_version(self):
+        writer = self.create()
+        writer["a"] = "1"
+        self.assertTrue(writer.publish_snapshot_blob())
+        self.redis_client.incr("{test_blob}:version")
+        self.assertFalse(writer._store_blob("1", {"a": "1"}))
+        self.assertTrue(self.redis_client.get("{test_blob}:snapshot").startswith("1:"))
+        with self.assertRaises(ValueError):
+            DelayButFastDict(redis_client=self.redis_client, key="test_blob", snapshot_blob=True, scan_count=10)
+
+
+class TestFastDictScan(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_scan}:value")
+        self.redis_client.delete("{test_scan}:version")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_scan}:value")
+        self.redis_client.delete("{test_scan}:version")
+
+    def create(self) -> DelayButFastDict[str, str]:
+        return DelayButFastDict(
+            redis_client=self.redis_client, key="test_scan", timeout=0, scan_count=100)
+
+    def test_scan_refresh(self):
+        self.redis_client.hset("{test_scan}:value", mapping={f"key_{i}": str(i) for i in range(1000)})
+        self.redis_client.incr("{test_scan}:version")
+        cache = self.create()
+
+        def fail():
+            raise AssertionError("HGETALL is not expected")
+        cache._load = fail  # type: ignore
+        self.assertEqual(len(cache), 1000)
+        self.assertEqual(cache["key_999"], "999")
+        self.assertEqual(cache.version, 1)
+
+    def test_retry_when_version_moves(self):
+        cache = self.create()
+        scans = []
+        scan = cache._scan
+
+        def write_during_scan():
+            value = scan()
+            if not scans:
+                self.redis_client.hset("{test_scan}:value", "late", "1")
+                self.redis_client.incr("{test_scan}:version")
+            scans.append(value)
+            return value
+        cache._scan = write_during_scan  # type: ignore
+        cache.refresh()
+        self.assertEqual(len(scans), 2)
+        self.assertEqual(cache["late"], "1")
+        self.assertEqual(cache.version, 1)
+
+    def test_fall_back_to_hgetall(self):
+        cache = self.create()
+
+        def always_write():
+            self.redis_client.incr("{test_scan}:version")
+            return {}
+        cache._scan = always_write  # type: ignore
+        self.redis_client.hset("{test_scan}:value", "a", "1")
+        cache.refresh()
+        self.assertEqual(dict(cache._value), {"a": "1"})
+        self.assertEqual(cache.version, cache.SCAN_RETRIES)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -12,6 +12,20 @@ from hot_redis.fast_dict import DelayButFastDict
 from redis import Redis
 
 
+class SlowVersionRedis(Redis):
+    """count the version reads and make them slow enough to overlap"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version_reads = 0
+
+    def get(self, name):
+        if name.endswith(":version"):
+            self.version_reads += 1
+            time.sleep(0.02)
+        return super().get(name)
+
+
 class TestFastDictStress(unittest.TestCase):
     """Stress tests and edge case tests"""
 
@@ -270,6 +284,57 @@ class TestFastDictStress(unittest.TestCase):
         for key in unicode_data.keys():
             self.assertIn(key, keys)
 
+    def test_single_flight_refresh(self):
+        """Only one of many reading threads checks the version when it expires"""
+        writer = DelayButFastDict[str, str](redis_client=self.redis_client, key="stress_dict", timeout=0)
+        writer.set_many({f"key_{i}": "0" for i in range(100)})
+        client = SlowVersionRedis(decode_responses=True)
+        test_dict = DelayButFastDict[str, str](redis_client=client, key="stress_dict", timeout=0.1)
+
+        # the first load: one thread reads redis, the others wait for its snapshot
+        barrier = threading.Barrier(64)
+        sizes = []
+
+        def first_read():
+            barrier.wait()
+            sizes.append(len(test_dict))
+
+        threads = [threading.Thread(target=first_read) for _ in range(64)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sizes, [100] * 64)
+        self.assertEqual(client.version_reads, 1)
+        client.version_reads = 0
+        stop = time.time() + 2
+        errors = []
+
+        def read():
+            while time.time() < stop:
+                values = set(test_dict.values())
+                # every snapshot is complete, never half refreshed
+                if len(values) != 1 or len(test_dict) != 100:
+                    errors.append(values)
+
+        def write():
+            generation = 0
+            while time.time() < stop:
+                generation += 1
+                writer.set_many({f"key_{i}": str(generation) for i in range(100)})
+                time.sleep(0.01)
+
+        threads = [threading.Thread(target=write)]
+        threads += [threading.Thread(target=read) for _ in range(64)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        # about one check per timeout instead of one per reading thread
+        self.assertLessEqual(client.version_reads, 30)
+        self.assertGreater(test_dict.version, 1)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -9,6 +9,7 @@ import logging
 from typing import List
 
 from hot_redis.fast_set import DelayButFastSet
+from hot_redis.int_set import IntSet
 from redis import Redis
 
 logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler()])
@@ -272,6 +273,73 @@ class TestFastSetGeneric(unittest.TestCase):
         self.assertTrue("123" in mixed_set)  # Integer converted to string
         self.assertTrue("3.14" in mixed_set)  # Float converted to string
 
+    def test_bulk_update(self):
+        for version in ("v1", "v2"):
+            test_set: DelayButFastSet[int] = DelayButFastSet(
+                redis_client=self.redis_client, key="test_set2", timeout=0, version=version)
+            test_set.update(*range(2500))
+            test_set.discard_many(*range(1, 2500))
+            self.assertEqual(set(test_set), {"0"})
+        self.assertEqual(self.redis_client.get("test_set2:version"), "3")
+        self.assertEqual(self.redis_client.get("{test_set2}:version"), "2")
+
+    def test_set_algebra(self):
+        left: DelayButFastSet[str] = DelayButFastSet(redis_client=self.redis_client, key="test_set", version="v2")
+        right: DelayButFastSet[str] = DelayButFastSet(redis_client=self.redis_client, key="test_set2", version="v2")
+        left.update("a", "b", "c")
+        right.update("b", "c", "d")
+        self.assertEqual(left & right, {"b", "c"})
+        self.assertEqual(left | right, {"a", "b", "c", "d"})
+        self.assertEqual(left ^ right, {"a", "d"})
+        self.assertEqual(left - right, {"a"})
+        self.assertEqual({"a", "x"} & left, {"a"})
+        self.assertEqual({"a", "x"} | left, {"a", "b", "c", "x"})
+        self.assertEqual({"a", "x"} - left, {"x"})
+        self.assertEqual(left.intersection(["a", "b"], right), {"b"})
+        self.assertEqual(left.union(["z"]), {"a", "b", "c", "z"})
+        self.assertEqual(left.intersection(), {"a", "b", "c"})
+        self.assertTrue(left.isdisjoint(["x"]))
+        self.assertFalse(left.isdisjoint(right))
+        self.assertTrue(left.issubset(["a", "b", "c", "d"]))
+        self.assertFalse(left.issubset(right))
+        self.assertTrue(left.issuperset(["a", "b"]))
+        self.assertFalse(left.issuperset(right))
+        with self.assertRaises(TypeError):
+            left & ["a"]
+
+    def test_set_algebra_int_members(self):
+        numbers: DelayButFastSet[int] = DelayButFastSet(
+            redis_client=self.redis_client, key="test_set", version="v2", int_members=True)
+        strings: DelayButFastSet[str] = DelayButFastSet(redis_client=self.redis_client, key="test_set2", version="v2")
+        numbers.update(1, 2, 3)
+        strings.update("1", "9")
+        self.assertEqual(numbers & {"1"}, {1})
+        self.assertEqual(numbers & {"1", "9", "10", "11", "12"}, {1})
+        self.assertEqual(numbers.intersection(["1", 1.5, "x"]), {1})
+        self.assertFalse(numbers.isdisjoint({"3", "9", "10", "11", "12"}))
+        self.assertEqual(numbers - {"1"}, {2, 3})
+        self.assertEqual(numbers | strings, {1, 2, 3, 9})
+        self.assertEqual(strings & numbers, {"1"})
+        self.assertEqual(strings.intersection(numbers, {"1", "x", "y", "z"}), {"1"})
+        self.assertTrue(numbers.issubset(["1", "2", "3"]))
+        self.assertTrue(numbers.issuperset(["1", "2"]))
+        strings.update("2", "3")
+        self.assertTrue(numbers.issubset(strings))
+        self.assertTrue(strings.issuperset(numbers))
+        self.assertFalse(numbers.issuperset(strings))
+
+    def test_snapshot(self):
+        test_set: DelayButFastSet[str] = DelayButFastSet(redis_client=self.redis_client, key="test_set", version="v2")
+        test_set.update("a", "b")
+        snapshot = test_set.snapshot()
+        self.assertEqual(snapshot, frozenset({"a", "b"}))
+        self.assertIs(test_set.snapshot(), snapshot)
+        test_set.add("c")
+        self.assertEqual(test_set.snapshot(), frozenset({"a", "b", "c"}))
+        self.assertEqual(snapshot, frozenset({"a", "b"}))
+        test_set.refresh()
+        self.assertIsNot(test_set.snapshot(), snapshot)
+
     def test_startup_init(self):
         """Test startup_init parameter"""
         # First create a set and add data
@@ -294,5 +362,213 @@ class TestFastSetGeneric(unittest.TestCase):
         self.assertTrue("existing_data" in set2)
 
 
+class TestFastSetChangelog(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_set_v3}:value")
+        self.redis_client.delete("{test_set_v3}:version")
+        self.redis_client.delete("{test_set_v3}:changelog")
+        self.redis_client.delete("{test_set_v3}:snapshot")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_set_v3}:value")
+        self.redis_client.delete("{test_set_v3}:version")
+        self.redis_client.delete("{test_set_v3}:changelog")
+        self.redis_client.delete("{test_set_v3}:snapshot")
+
+    def create(self, changelog_size=10) -> DelayButFastSet[str]:
+        return DelayButFastSet(
+            redis_client=self.redis_client,
+            key="test_set_v3",
+            timeout=0,
+            version="v3",
+            changelog_size=changelog_size,
+        )
+
+    def test_apply_changes_without_full_refresh(self):
+        writer = self.create()
+        reader = self.create()
+        writer.update("a", "b", "c")
+        self.assertEqual(set(reader), {"a", "b", "c"})
+
+        def fail():
+            raise AssertionError("full refresh is not expected")
+        reader.refresh = fail  # type: ignore
+        writer.add("d")
+        writer.discard("a")
+        writer.update("e", "f")
+        self.assertEqual(set(reader), {"b", "c", "d", "e", "f"})
+        self.assertEqual(reader.version, int(self.redis_client.get("{test_set_v3}:version")))
+
+    def test_trimmed_changelog_falls_back_to_full_refresh(self):
+        writer = self.create(changelog_size=2)
+        reader = self.create(changelog_size=2)
+        writer.add("a")
+        self.assertTrue("a" in reader)
+        for i in range(5):
+            writer.add(i)
+        self.assertEqual(len(reader), 6)
+
+    def test_tracking_invalidation(self):
+        writer = self.create()
+        reader = DelayButFastSet(
+            redis_client=self.redis_client,
+            key="test_set_v3",
+            timeout=3600,
+            version="v3",
+            invalidation="tracking",
+        )
+        self.assertTrue(reader.watcher.ready.wait(2))
+        writer.add("a")
+        deadline = time.perf_counter() + 2
+        while "a" not in reader and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        self.assertTrue("a" in reader)
+        reader.close()
+
+    def test_scan_refresh(self):
+        self.redis_client.sadd("{test_set_v3}:value", *range(500))
+        reader = DelayButFastSet(
+            redis_client=self.redis_client,
+            key="test_set_v3",
+            timeout=0,
+            version="v3",
+            scan_count=50,
+        )
+        self.assertEqual(len(reader), 500)
+        self.assertTrue(499 in reader)
+
+    def test_int_members(self):
+        writer = self.create()
+        writer.update(*range(100))
+        reader = DelayButFastSet(
+            redis_client=self.redis_client,
+            key="test_set_v3",
+            timeout=0,
+            version="v3",
+            int_members=True,
+        )
+        self.assertTrue(5 in reader)
+        self.assertTrue("5" in reader)
+        self.assertFalse(100 in reader)
+        self.assertFalse("abc" in reader)
+        self.assertFalse(5.5 in reader)
+        self.assertFalse(True in reader)
+        self.assertIsInstance(reader._value, IntSet)
+        writer.discard(5)
+        writer.add(1000)
+        self.assertFalse(5 in reader)
+        self.assertTrue(1000 in reader)
+        reader.add(2000)
+        self.assertTrue(2000 in reader)
+        self.assertEqual(len(reader), 101)
+        self.assertEqual(list(reader)[:3], [0, 1, 2])
+
+    def test_int_members_rejects_other_values(self):
+        numbers = DelayButFastSet(
+            redis_client=self.redis_client, key="test_set_v3", timeout=0, version="v3",
+            changelog_size=10, int_members=True)
+        for value in ("abc", 2 ** 63, 1.5, True, "01"):
+            with self.assertRaises(ValueError):
+                numbers.add(value)
+            with self.assertRaises(ValueError):
+                numbers.update(1, value)
+        self.assertIsNone(self.redis_client.get("{test_set_v3}:version"))
+        numbers.update(2.0, "-3", 2 ** 63 - 1)
+        numbers.discard("abc")
+        numbers.discard_many(2 ** 64, 1.5)
+        self.assertEqual(self.redis_client.get("{test_set_v3}:version"), "1")
+        self.assertEqual(self.redis_client.smembers("{test_set_v3}:value"), {"2", "-3", str(2 ** 63 - 1)})
+        numbers.discard(2.0)
+        reader = DelayButFastSet(
+            redis_client=self.redis_client, key="test_set_v3", timeout=0, version="v3", int_members=True)
+        self.assertEqual(set(reader), {-3, 2 ** 63 - 1})
+
+    def test_write_behind(self):
+        writer = DelayButFastSet(
+            redis_client=self.redis_client, key="test_set_v3", timeout=0,
+            version="v3", write_behind=60, write_behind_size=100)
+        reader = self.create()
+        for i in range(98):
+            writer.add(i)
+        writer.discard(0)
+        self.assertTrue("1" in writer)
+        self.assertFalse("0" in writer)
+        self.assertEqual(len(reader), 0)
+        # a refresh keeps the buffered writes visible
+        writer.refresh()
+        self.assertEqual(len(writer), 97)
+        writer.add(98)
+        # the 100th op flushed the buffer with one version increase
+        self.assertEqual(self.redis_client.get("{test_set_v3}:version"), "1")
+        self.assertEqual(len(reader), 98)
+        writer.add("late")
+        writer.close()
+        self.assertTrue("late" in reader)
+        self.assertEqual(reader.version, 2)
+
+    def test_write_behind_interval(self):
+        writer = DelayButFastSet(
+            redis_client=self.redis_client, key="test_set_v3", timeout=0,
+            version="v3", write_behind=0.05)
+        writer.update("a", "b")
+        writer.add("c")
+        deadline = time.time() + 2
+        while self.redis_client.scard("{test_set_v3}:value") < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.redis_client.smembers("{test_set_v3}:value"), {"a", "b", "c"})
+        self.assertEqual(self.redis_client.get("{test_set_v3}:version"), "1")
+        writer.close()
+
+    def test_conditional_fetch(self):
+        writer = self.create()
+        reader = DelayButFastSet(
+            redis_client=self.redis_client, key="test_set_v3", timeout=0,
+            version="v3", changelog_size=10, conditional_fetch=True)
+        writer.update("a", "b")
+        self.assertEqual(set(reader), {"a", "b"})
+        writer.discard("a")
+        self.assertEqual(set(reader), {"b"})
+        self.assertEqual(reader.version, 2)
+        with self.assertRaises(ValueError):
+            DelayButFastSet(redis_client=self.redis_client, key="test_set_v3", conditional_fetch=True)
+
+    def test_snapshot_blob(self):
+        writer = self.create()
+        writer.update(*range(100))
+        reader = DelayButFastSet(
+            redis_client=self.redis_client, key="test_set_v3", timeout=0, version="v3",
+            snapshot_blob=True, int_members=True)
+        self.assertEqual(len(reader), 100)
+        other = DelayButFastSet(
+            redis_client=self.redis_client, key="test_set_v3", timeout=0, version="v3",
+            snapshot_blob=True)
+        other._queue_load = None  # type: ignore
+        self.assertEqual(set(other), {str(i) for i in range(100)})
+
+    def test_on_change(self):
+        writer = self.create()
+        reader = DelayButFastSet(
+            redis_client=self.redis_client, key="test_set_v3", timeout=0, version="v3",
+            changelog_size=10, int_members=True)
+        writer.update("1", "2")
+        self.assertEqual(len(reader), 2)
+        changes = []
+        reader.on_change(changes.append)
+        writer.add("3")
+        writer.discard("1")
+        self.assertEqual(reader.snapshot(), {2, 3})
+        self.assertEqual(len(changes), 1)
+        self.assertEqual((changes[0].added, changes[0].removed), ({3}, {1}))
+        reader.add(4)
+        self.assertEqual(changes[1].added, {4})
+        self.assertEqual(reader.snapshot(), {2, 3, 4})
+
+    def test_invalid_version(self):
+        with self.assertRaises(ValueError):
+            DelayButFastSet(redis_client=self.redis_client, key="test_set_v3", version="v4")
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+from hot_redis.int_set import IntSet
+
+
+class TestIntSet(unittest.TestCase):
+
+    def test_membership(self):
+        value = IntSet(["3", "1", "2", 2])
+        self.assertEqual(list(value), [1, 2, 3])
+        self.assertTrue(1 in value)
+        self.assertTrue("3" in value)
+        self.assertFalse(4 in value)
+        self.assertFalse("abc" in value)
+        self.assertFalse(None in value)
+        self.assertEqual(len(value), 3)
+
+    def test_non_integral_probes(self):
+        value = IntSet(["1", "2", "-3"])
+        self.assertTrue(2.0 in value)
+        self.assertTrue("-3" in value)
+        self.assertFalse(1.5 in value)
+        self.assertFalse(True in value)
+        self.assertFalse("01" in value)
+        self.assertFalse(" 1" in value)
+        self.assertFalse("1.0" in value)
+        value.discard(2.5)
+        value.discard(True)
+        self.assertEqual(list(value), [-3, 1, 2])
+        value.discard(2.0)
+        self.assertEqual(list(value), [-3, 1])
+
+    def test_update(self):
+        value = IntSet()
+        value.add("5")
+        value.add(5)
+        value.update(["1", "9"])
+        value.update(range(100, 120))
+        self.assertEqual(len(value), 23)
+        value.discard("abc")
+        value.discard(1)
+        value.difference_update(["9", 100])
+        value.difference_update(range(101, 120))
+        self.assertEqual(list(value), [5])
+        copied = value.copy()
+        value.clear()
+        self.assertEqual(list(copied), [5])
+        self.assertEqual(len(value), 0)
+
+    def test_set_operations(self):
+        value = IntSet([1, 2, 3])
+        self.assertEqual(value - {2}, IntSet([1, 3]))
+        self.assertEqual({1, 2, 3, 4} - value, {4})
+        self.assertEqual(value, {1, 2, 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
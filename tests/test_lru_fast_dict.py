@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import time
+import unittest
+
+from redis import Redis
+
+from hot_redis.fast_dict import DelayButFastDict
+from hot_redis.lru_fast_dict import LRUDelayButFastDict
+
+
+class CountingRedis(Redis):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands = []
+
+    def execute_command(self, *args, **kwargs):
+        self.commands.append(args[0])
+        return super().execute_command(*args, **kwargs)
+
+
+class TestLRUFastDict(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_lru}:value", "{test_lru}:version", "{test_lru}:changelog")
+        self.writer = DelayButFastDict(redis_client=self.redis_client, key="test_lru", changelog_size=10)
+        self.writer.update({f"key_{i}": str(i) for i in range(100)})
+
+    def tearDown(self):
+        self.redis_client.delete("{test_lru}:value", "{test_lru}:version", "{test_lru}:changelog")
+
+    def create(self, **kwargs) -> LRUDelayButFastDict[str, str]:
+        self.counting = CountingRedis(decode_responses=True)
+        return LRUDelayButFastDict(
+            redis_client=self.counting, key="test_lru", changelog_size=10, **kwargs)
+
+    def test_read_through(self):
+        cache = self.create(timeout=60)
+        self.assertEqual(cache["key_1"], "1")
+        self.assertEqual(cache["key_1"], "1")
+        self.assertFalse("missing" in cache)
+        self.assertEqual(cache.get("missing", "default"), "default")
+        with self.assertRaises(KeyError):
+            cache["missing"]
+        self.assertEqual(self.counting.commands, ["GET", "HMGET", "HMGET"])
+        self.assertEqual(cache.get_many(["key_1", "key_2", "key_3", "missing"]), {"key_1": "1", "key_2": "2", "key_3": "3"})
+        self.assertEqual(self.counting.commands.count("HMGET"), 3)
+        self.assertEqual(len(cache), 100)
+        self.assertEqual(dict(cache.items())["key_99"], "99")
+        self.assertNotIn("HGETALL", self.counting.commands)
+
+    def test_bounded(self):
+        cache = self.create(timeout=60, maxsize=10)
+        for i in range(100):
+            self.assertEqual(cache[f"key_{i}"], str(i))
+        self.assertEqual(cache.stats()["entries"], 10)
+        self.counting.commands.clear()
+        cache["key_99"]
+        self.assertEqual(self.counting.commands, [])
+        cache["key_0"]
+        self.assertEqual(self.counting.commands, ["HMGET"])
+
+    def test_ttl(self):
+        cache = self.create(timeout=60, ttl=0.05)
+        cache["key_1"]
+        self.redis_client.hset("{test_lru}:value", "key_1", "changed")
+        self.assertEqual(cache["key_1"], "1")
+        time.sleep(0.06)
+        self.assertEqual(cache["key_1"], "changed")
+
+    def test_version_invalidation(self):
+        cache = self.create(timeout=0)
+        self.assertEqual(cache["key_1"], "1")
+        self.assertEqual(cache["key_2"], "2")
+        self.assertFalse("new" in cache)
+        self.writer["key_1"] = "changed"
+        self.writer["new"] = "1"
+        # the changelog only drops the written fields
+        self.assertEqual(cache["key_1"], "changed")
+        self.assertTrue("new" in cache)
+        self.counting.commands.clear()
+        self.assertEqual(cache["key_2"], "2")
+        self.assertEqual(self.counting.commands, ["GET"])
+        self.writer.clear()
+        self.assertFalse("key_2" in cache)
+
+    def test_own_writes(self):
+        cache = self.create(timeout=60, codec="int")
+        self.assertEqual(cache["key_2"], 2)
+        cache["a"] = 1
+        del cache["key_1"]
+        self.counting.commands.clear()
+        self.assertEqual(cache["a"], 1)
+        self.assertFalse("key_1" in cache)
+        self.assertEqual(self.counting.commands, [])
+
+    def test_own_write_during_fetch(self):
+        cache = self.create(timeout=60)
+        hmget = self.counting.hmget
+
+        def racing_hmget(*args, **kwargs):
+            items = hmget(*args, **kwargs)
+            self.counting.hmget = hmget  # type: ignore
+            cache["key_1"] = "new"
+            return items
+        self.counting.hmget = racing_hmget  # type: ignore
+        self.assertEqual(cache["key_1"], "1")
+        self.assertEqual(cache["key_1"], "new")
+        self.assertEqual(cache.get_many(["key_1"]), {"key_1": "new"})
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            LRUDelayButFastDict(redis_client=self.redis_client, key="test_lru", scan_count=10)
+        with self.assertRaises(ValueError):
+            LRUDelayButFastDict(redis_client=self.redis_client, key="test_lru", maxsize=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
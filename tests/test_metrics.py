@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+from redis import Redis
+
+from hot_redis.fast_dict import DelayButFastDict
+from hot_redis.fast_set import DelayButFastSet
+from hot_redis.metrics import prometheus_text
+
+
+KEYS = [
+    "{test_metrics}:value", "{test_metrics}:version", "{test_metrics}:changelog",
+    "{test_metrics_set}:value", "{test_metrics_set}:version",
+]
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete(*KEYS)
+
+    def tearDown(self):
+        self.redis_client.delete(*KEYS)
+
+    def test_stats(self):
+        writer = DelayButFastDict(redis_client=self.redis_client, key="test_metrics", changelog_size=10)
+        writer.update({"a": "1", "bb": "22"})
+        cache = DelayButFastDict(
+            redis_client=self.redis_client, key="test_metrics", timeout=0, changelog_size=10)
+        self.assertIsNone(cache.stats()["snapshot_age"])
+        self.assertEqual(cache["a"], "1")
+        stats = cache.stats()
+        self.assertEqual(stats["version_checks"], 1)
+        self.assertEqual((stats["refreshes"], stats["delta_refreshes"]), (1, 0))
+        self.assertEqual((stats["payload_entries"], stats["payload_bytes"]), (2, 6))
+        self.assertEqual(stats["entries"], 2)
+        self.assertGreater(stats["memory_bytes"], 0)
+        self.assertGreaterEqual(stats["snapshot_age"], 0)
+
+        writer["c"] = "3"
+        self.assertEqual(cache["c"], "3")
+        self.assertEqual(cache["c"], "3")
+        stats = cache.stats()
+        self.assertEqual(stats["version_checks"], 3)
+        self.assertEqual((stats["refreshes"], stats["delta_refreshes"]), (1, 1))
+        self.assertEqual(stats["refresh_seconds"]["count"], 2)
+        self.assertEqual(sum(stats["refresh_seconds"]["buckets"]), 2)
+        self.assertEqual(stats["entries"], 3)
+
+    def test_prometheus_text(self):
+        cache = DelayButFastDict(redis_client=self.redis_client, key="test_metrics", startup_init=True)
+        members = DelayButFastSet(
+            redis_client=self.redis_client, key="test_metrics_set", version="v2",
+            startup_init=True, int_members=True)
+        text = prometheus_text([cache, members])
+        lines = text.splitlines()
+        self.assertEqual(lines.count("# TYPE hot_redis_cache_refresh_seconds histogram"), 1)
+        self.assertIn('hot_redis_cache_refreshes_total{cache="{test_metrics}:value",kind="full"} 1', lines)
+        self.assertIn('hot_redis_cache_refresh_seconds_bucket{cache="{test_metrics_set}:value",le="+Inf"} 1', lines)
+        self.assertIn('hot_redis_cache_refresh_seconds_count{cache="{test_metrics}:value"} 1', lines)
+        self.assertIn('hot_redis_cache_entries{cache="{test_metrics_set}:value"} 0', lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+import fcntl
+import os
+import tempfile
+import time
+import unittest
+
+from redis import Redis
+
+from hot_redis.fast_dict import DelayButFastDict
+from hot_redis.fast_set import DelayButFastSet
+from hot_redis.shared_snapshot import SharedSnapshot, write_snapshot
+
+
+class NoRedis:
+
+    def __getattr__(self, name):
+        raise AssertionError(f"redis is not expected: {name}")
+
+
+class TestSharedSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "snapshot")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        items = {f"key_{i}": f"value_{i}" for i in range(1000)}
+        items["中文"] = "值"
+        items[""] = ""
+        write_snapshot(self.path, 7, items)
+        snapshot = SharedSnapshot(self.path)
+        self.assertEqual(snapshot.version, 7)
+        self.assertEqual(len(snapshot), len(items))
+        self.assertEqual(snapshot["key_500"], "value_500")
+        self.assertEqual(snapshot["中文"], "值")
+        self.assertEqual(snapshot[""], "")
+        self.assertTrue("key_999" in snapshot)
+        self.assertFalse("key_1000" in snapshot)
+        self.assertEqual(snapshot.get("missing", "default"), "default")
+        self.assertEqual(dict(snapshot.items()), items)
+        with self.assertRaises(KeyError):
+            snapshot["missing"]
+
+    def test_empty(self):
+        write_snapshot(self.path, 0, {})
+        snapshot = SharedSnapshot(self.path)
+        self.assertEqual(len(snapshot), 0)
+        self.assertFalse("a" in snapshot)
+
+
+class TestFastDictSharedSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_shared}:value")
+        self.redis_client.delete("{test_shared}:version")
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "test_shared")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_shared}:value")
+        self.redis_client.delete("{test_shared}:version")
+        self.tmpdir.cleanup()
+
+    def create(self, timeout=10) -> DelayButFastDict[str, str]:
+        return DelayButFastDict(
+            redis_client=self.redis_client, key="test_shared", timeout=timeout, shared_path=self.path)
+
+    def test_one_process_talks_to_redis(self):
+        self.redis_client.hset("{test_shared}:value", mapping={"a": "1", "b": "2"})
+        self.redis_client.incr("{test_shared}:version")
+        publisher = self.create()
+        self.assertEqual(publisher["a"], "1")
+        self.assertTrue(os.path.exists(self.path))
+
+        worker = self.create()
+        worker.redis_client = NoRedis()
+        self.assertEqual(worker["b"], "2")
+        self.assertEqual(worker.version, 1)
+        self.assertEqual(dict(worker.items()), {"a": "1", "b": "2"})
+
+    def test_write_publishes_new_snapshot(self):
+        publisher = self.create(timeout=0.05)
+        publisher["a"] = "1"
+        self.assertEqual(publisher["a"], "1")
+        worker = self.create(timeout=0.05)
+        self.assertEqual(worker["a"], "1")
+        worker["a"] = "2"
+        self.assertEqual(worker["a"], "2")
+        time.sleep(0.06)
+        self.assertEqual(publisher["a"], "2")
+        del publisher["a"]
+        self.assertFalse("a" in publisher)
+
+    def test_own_write_while_another_process_checks(self):
+        self.redis_client.hset("{test_shared}:value", mapping={"a": "1", "b": "1"})
+        self.redis_client.incr("{test_shared}:version")
+        worker = self.create(timeout=0)
+        self.assertEqual(worker["a"], "1")
+        with open(f"{self.path}.lock", "a+") as lock:
+            # another worker holds the lock and publishes nothing meanwhile
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            worker["c"] = "3"
+            del worker["a"]
+            self.assertEqual(worker.get("c"), "3")
+            self.assertFalse("a" in worker)
+            self.assertEqual(dict(worker.items()), {"b": "1", "c": "3"})
+            worker.clear()
+            worker["d"] = "4"
+            self.assertEqual(dict(worker.items()), {"d": "4"})
+            self.assertEqual(worker.version, 1)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        self.assertEqual(dict(worker.items()), {"d": "4"})
+        self.assertEqual(worker.version, 5)
+        self.assertFalse(worker._own_writes)
+        self.assertIsInstance(worker._value, SharedSnapshot)
+
+
+
+class TestWarmStart(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "snapshot")
+        self.redis_client = Redis(decode_responses=True)
+        self.redis_client.delete("{test_warm}:value", "{test_warm}:version", "{test_warm}:changelog")
+
+    def tearDown(self):
+        self.redis_client.delete("{test_warm}:value", "{test_warm}:version", "{test_warm}:changelog")
+        self.tmpdir.cleanup()
+
+    def wait_for(self, condition, timeout=2.0):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_start_without_redis(self):
+        writer = DelayButFastDict(redis_client=self.redis_client, key="test_warm", codec="json")
+        writer.update({"a": [1], "b": {"c": 2}})
+        cache = DelayButFastDict(
+            redis_client=self.redis_client, key="test_warm", startup_init=True,
+            codec="json", snapshot_path=self.path)
+        cache.close()
+        unreachable = Redis(port=1, decode_responses=True)
+        warm = DelayButFastDict(
+            redis_client=unreachable, key="test_warm", timeout=60,
+            codec="json", snapshot_path=self.path)
+        self.assertEqual(warm.version, 1)
+        self.assertEqual(dict(warm.items()), {"a": [1], "b": {"c": 2}})
+        warm.close()
+
+    def test_catch_up_in_background(self):
+        writer = DelayButFastDict(
+            redis_client=self.redis_client, key="test_warm", timeout=0, changelog_size=10)
+        writer["a"] = "1"
+        cache = DelayButFastDict(
+            redis_client=self.redis_client, key="test_warm", timeout=60,
+            changelog_size=10, snapshot_path=self.path, startup_init=True)
+        cache.close()
+        writer["b"] = "2"
+
+        warm = DelayButFastDict(
+            redis_client=self.redis_client, key="test_warm", timeout=60,
+            changelog_size=10, snapshot_path=self.path)
+        self.assertTrue(self.wait_for(lambda: warm.version == 2))
+        self.assertEqual(dict(warm.items()), {"a": "1", "b": "2"})
+        warm.close()
+
+    def test_set_and_unreadable_file(self):
+        with open(self.path, "w") as f:
+            f.write("garbage")
+        self.redis_client.sadd("{test_warm}:value", "1", "2")
+        self.redis_client.incr("{test_warm}:version")
+        cache = DelayButFastSet(
+            redis_client=self.redis_client, key="test_warm", version="v2",
+            startup_init=True, int_members=True, snapshot_path=self.path)
+        self.assertEqual(list(cache), [1, 2])
+        cache.close()
+        warm = DelayButFastSet(
+            redis_client=Redis(port=1, decode_responses=True), key="test_warm", version="v2",
+            timeout=60, int_members=True, snapshot_path=self.path)
+        self.assertTrue(2 in warm)
+        self.assertEqual(len(warm), 2)
+        warm.close()
+
+if __name__ == "__main__":
+    unittest.main()